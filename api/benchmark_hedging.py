@@ -0,0 +1,126 @@
+"""
+Benchmark hedged OpenAI calls against stubbed deployments.
+
+Runs the same workload twice through shared.hedging.hedged_call - once with
+hedging effectively off (budget 0) and once with the given budget - against
+stub clients whose chat.completions.create sleeps for a latency drawn from a
+distribution with a slow tail, and prints latency percentiles for both runs.
+Primary and hedge deployments draw latencies independently, like two
+deployments (or resources) whose slow requests are not correlated. As in
+create_chat_completion, primary calls and hedges each take a FairScheduler
+slot, so --concurrency caps both.
+
+Usage (from the api/ directory):
+    python benchmark_hedging.py
+    python benchmark_hedging.py --calls 5000 --tail-fraction 0.05 --tail-seconds 2
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from shared.admission import FairScheduler
+from shared.hedging import LatencyTracker, HedgingBudget, hedged_call
+
+
+class _StubCompletions:
+    def __init__(self, latency):
+        self.latency = latency
+        self.calls = 0
+        self.cancelled = 0
+
+    async def create(self, model: str, messages: list, **kwargs):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.latency())
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return {"model": model, "choices": [{"message": {"content": "{}"}}]}
+
+
+class StubClient:
+    """Stands in for AsyncAzureOpenAI: only chat.completions.create is implemented."""
+
+    def __init__(self, latency):
+        self.chat = type("Chat", (), {})()
+        self.chat.completions = _StubCompletions(latency)
+
+
+def latency_model(rng: random.Random, base_seconds: float, tail_fraction: float, tail_seconds: float):
+    """Latency sampler: lognormal around base_seconds, with tail_fraction of calls taking ~tail_seconds."""
+    def latency():
+        if rng.random() < tail_fraction:
+            return tail_seconds * rng.uniform(0.8, 1.2)
+        return base_seconds * rng.lognormvariate(0, 0.25)
+    return latency
+
+
+def percentile(samples: list, value: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * value / 100))]
+
+
+async def run(args, budget_fraction: float) -> dict:
+    rng = random.Random(args.seed)
+    primary_client = StubClient(latency_model(rng, args.base_ms / 1000, args.tail_fraction, args.tail_seconds))
+    hedge_client = StubClient(latency_model(rng, args.base_ms / 1000, args.tail_fraction, args.tail_seconds))
+    tracker = LatencyTracker()
+    budget = HedgingBudget(budget_fraction)
+    messages = [{"role": "user", "content": "benchmark"}]
+    latencies = []
+    scheduler = FairScheduler(args.concurrency)
+
+    async def one_call():
+        async def primary():
+            return await primary_client.chat.completions.create(model="primary", messages=messages)
+
+        async def hedge():
+            async with scheduler.slot("benchmark"):
+                return await hedge_client.chat.completions.create(model="hedge", messages=messages)
+
+        async with scheduler.slot("benchmark"):
+            # Measured from the primary's slot; a hedge's wait for its own slot is included
+            started = time.monotonic()
+            await hedged_call(
+                primary, hedge, 1.0, tracker, budget,
+                percentile=args.percentile, default_delay=args.tail_seconds, min_delay=0.0
+            )
+            latencies.append(time.monotonic() - started)
+
+    await asyncio.gather(*[one_call() for _ in range(args.calls)])
+    hedges = hedge_client.chat.completions.calls
+    return {
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "max": max(latencies),
+        "hedged": hedges / args.calls,
+        "hedgeWins": (hedges - hedge_client.chat.completions.cancelled) / args.calls,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark hedged calls against stubbed deployments.")
+    parser.add_argument('--calls', type=int, default=2000, help="Calls per run")
+    parser.add_argument('--concurrency', type=int, default=50, help="Concurrent calls")
+    parser.add_argument('--base-ms', type=float, default=20, help="Typical latency in milliseconds")
+    parser.add_argument('--tail-fraction', type=float, default=0.03, help="Fraction of slow calls")
+    parser.add_argument('--tail-seconds', type=float, default=1.0, help="Latency of slow calls")
+    parser.add_argument('--percentile', type=float, default=95, help="Hedge after this latency percentile")
+    parser.add_argument('--budget', type=float, default=0.1, help="Hedge spend as a fraction of primary spend")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    print(f"{'run':<10}{'p50':>8}{'p95':>8}{'p99':>8}{'max':>8}{'hedged':>9}{'won':>7}")
+    for name, budget_fraction in (("baseline", 0.0), ("hedged", args.budget)):
+        result = asyncio.run(run(args, budget_fraction))
+        print(
+            f"{name:<10}{result['p50']:>8.3f}{result['p95']:>8.3f}{result['p99']:>8.3f}{result['max']:>8.3f}"
+            f"{result['hedged']:>9.1%}{result['hedgeWins']:>7.1%}"
+        )
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,281 @@
+"""
+Offline bulk summarization without going through the HTTP API.
+
+Summarizes a directory of PDF/text files and/or a JSONL file of URLs using the
+same extractors and summarizer as the Function App. Extraction runs in a
+process pool, OpenAI calls run concurrently on an asyncio loop, and results
+are appended to a JSONL output file which doubles as the checkpoint: re-running
+the same command skips everything already summarized successfully. With
+--store, an item is only written to the checkpoint once its batch is stored.
+
+Usage (from the api/ directory):
+    python bulk_summarize.py --dir ./pdfs --output summaries.jsonl
+    python bulk_summarize.py --urls urls.jsonl --output summaries.jsonl --concurrency 16 --store
+
+Each line of the URL file is either a JSON string or an object such as
+{"url": "https://...", "type": "article"}; type defaults to "video" for
+YouTube URLs and "article" otherwise.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+# Configuration is read at import time by the shared modules
+load_dotenv()
+# Keep every info log in the terminal (the API samples them)
+os.environ.setdefault("LOG_INFO_SAMPLE_RATE", "1.0")
+
+from shared.video_processor import extract_video_id, fetch_transcript
+from shared.openai_client import summarize_content, summarize_sectioned
+from shared.web_scraper import fetch_article_content, get_article_id, content_hash
+from shared.pdf_processor import extract_pdf_text
+from shared.text_processor import process_text_input
+from shared.admission import current_user, set_openai_concurrency
+from shared.prompts import PROMPT_VERSION
+from shared.vector_index import index_summary
+from shared.storage import get_storage
+
+logger = logging.getLogger("bulk_summarize")
+
+TEXT_EXTENSIONS = ('.txt', '.md')
+
+
+def collect_jobs(directory: str, urls_file: str) -> list:
+    """Build the list of jobs from a directory of files and/or a JSONL file of URLs."""
+    jobs = []
+
+    if directory:
+        for root, _, files in os.walk(directory):
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                lower = name.lower()
+                if lower.endswith('.pdf'):
+                    jobs.append({"key": os.path.relpath(path, directory), "type": "pdf", "path": path})
+                elif lower.endswith(TEXT_EXTENSIONS):
+                    jobs.append({"key": os.path.relpath(path, directory), "type": "text", "path": path})
+
+    if urls_file:
+        with open(urls_file, encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                entry = json.loads(line)
+                if isinstance(entry, str):
+                    entry = {"url": entry}
+                url = entry['url']
+                job_type = entry.get('type') or ("video" if extract_video_id(url) else "article")
+                jobs.append({"key": url, "type": job_type, "url": url})
+
+    return jobs
+
+
+def load_checkpoint(output: str) -> set:
+    """Keys already summarized successfully in a previous run."""
+    done = set()
+    if os.path.exists(output):
+        with open(output, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # Partially written last line from an interrupted run
+                    continue
+                if 'error' not in record:
+                    done.add(record['key'])
+    return done
+
+
+def extract(job: dict):
+    """Run extraction for one job (executed in a worker process)."""
+    if job['type'] == 'pdf':
+        with open(job['path'], 'rb') as f:
+            return extract_pdf_text(f.read(), os.path.basename(job['path']))
+    if job['type'] == 'text':
+        with open(job['path'], encoding='utf-8', errors='replace') as f:
+            return process_text_input(f.read())
+    if job['type'] == 'video':
+        video_id = extract_video_id(job['url'])
+        return fetch_transcript(video_id, job.get('language', 'English')) if video_id else None
+    return fetch_article_content(job['url'])
+
+
+async def summarize_job(job: dict, extracted: dict, user_id: str, language: str) -> dict:
+    """Summarize extracted content and build the document stored for it."""
+    created_at = datetime.utcnow().isoformat()
+
+    if job['type'] == 'video':
+        video_id = extract_video_id(job['url'])
+        summary = await summarize_content(extracted['text'], video_id, language, "video", extracted.get('language'))
+        return {
+            "id": video_id,
+            "userId": user_id,
+            "videoUrl": job['url'],
+            "videoId": video_id,
+            "transcript": extracted['text'],
+            "summary": summary,
+            "timestamps": extracted.get('timestamps', []),
+            "createdAt": created_at,
+            "duration": extracted.get('duration', 0)
+        }
+
+    if job['type'] == 'article':
+        sections = extracted.get('sections') or [
+            {"hash": content_hash(extracted['text']), "text": extracted['text']}
+        ]
+        summary, section_summaries, _ = await summarize_sectioned(sections, {}, job['url'], language, "article")
+        return {
+            "id": get_article_id(job['url']),
+            "userId": user_id,
+            "contentType": "article",
+            "title": extracted.get('title', 'Untitled'),
+            "author": extracted.get('author', 'Unknown'),
+            "url": job['url'],
+            "summary": summary,
+            "language": language,
+            "promptVersion": PROMPT_VERSION,
+            "createdAt": created_at,
+            "sections": [
+                {"hash": section['hash'], "summary": section_summary}
+                for section, section_summary in zip(sections, section_summaries)
+            ]
+        }
+
+    summary = await summarize_content(extracted['text'], job['key'], language, job['type'])
+    document = {
+        "id": f"{job['type']}_" + hashlib.sha256(job['key'].encode('utf-8')).hexdigest()[:32],
+        "userId": user_id,
+        "contentType": job['type'],
+        "source": job['key'],
+        "summary": summary,
+        "language": language,
+        "createdAt": created_at
+    }
+    if job['type'] == 'pdf':
+        document.update({"filename": extracted['filename'], "pages": extracted['pages']})
+    else:
+        document.update({"word_count": extracted['word_count'], "char_count": extracted['char_count']})
+    return document
+
+
+async def run(args) -> int:
+    jobs = collect_jobs(args.dir, args.urls)
+    done = load_checkpoint(args.output)
+    pending = [job for job in jobs if job['key'] not in done]
+    logger.info("%s jobs, %s already done, %s to process", len(jobs), len(done), len(pending))
+
+    set_openai_concurrency(args.concurrency)
+    current_user.set(args.user_id)
+
+    storage = get_storage() if args.store else None
+    if args.store and not storage:
+        logger.error("--store requires a STORAGE_BACKEND other than none")
+        return 2
+
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    for job in pending:
+        job['language'] = args.language
+        queue.put_nowait(job)
+
+    stats = {"ok": 0, "failed": 0}
+    store_buffer = []
+
+    with open(args.output, 'a', encoding='utf-8') as output, \
+            ProcessPoolExecutor(max_workers=args.workers) as pool:
+
+        def write(record: dict):
+            output.write(json.dumps(record, ensure_ascii=False) + '\n')
+            output.flush()
+
+        def write_done(job: dict, document: dict):
+            write({"key": job['key'], "type": job['type'], "document": document})
+            stats["ok"] += 1
+
+        async def flush_store():
+            batch = store_buffer[:]
+            store_buffer.clear()
+            if not batch:
+                return
+            try:
+                await storage.bulk_save_summaries([document for _, document in batch])
+            except Exception as e:
+                # Upserts are idempotent: record the batch as failed so a re-run retries it
+                logger.error("Could not bulk save summaries: %s", e)
+                for job, _ in batch:
+                    write({"key": job['key'], "type": job['type'], "error": f"store failed: {e}"})
+                stats["failed"] += len(batch)
+                return
+            # Checkpoint only once stored, so a crash with a partly filled buffer re-runs those items
+            for job, document in batch:
+                write_done(job, document)
+
+        async def worker():
+            while True:
+                try:
+                    job = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                try:
+                    extracted = await loop.run_in_executor(pool, extract, job)
+                    if not extracted:
+                        raise ValueError("no content could be extracted")
+                    document = await summarize_job(job, extracted, args.user_id, args.language)
+                    if storage:
+                        try:
+                            await index_summary(document)
+                        except Exception as e:
+                            logger.warning("Could not index %s for search: %s", job['key'], e)
+                        store_buffer.append((job, document))
+                        if len(store_buffer) >= args.store_batch_size:
+                            await flush_store()
+                    else:
+                        write_done(job, document)
+                except Exception as e:
+                    logger.error("Failed %s: %s", job['key'], e)
+                    write({"key": job['key'], "type": job['type'], "error": str(e)})
+                    stats["failed"] += 1
+
+                processed = stats["ok"] + stats["failed"]
+                if processed % 100 == 0:
+                    logger.info("Progress: %s/%s (%s failed)", processed, len(pending), stats['failed'])
+
+        # Keep enough jobs in flight that extraction overlaps with OpenAI calls
+        await asyncio.gather(*[worker() for _ in range(args.concurrency + args.workers)])
+        if storage:
+            await flush_store()
+
+    logger.info("Done: %s summarized, %s failed", stats['ok'], stats['failed'])
+    return 1 if stats["failed"] else 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Bulk summarize files and URLs offline.")
+    parser.add_argument('--dir', help="Directory of .pdf/.txt/.md files (searched recursively)")
+    parser.add_argument('--urls', help="JSONL file of article/video URLs")
+    parser.add_argument('--output', required=True, help="JSONL output file (also used as checkpoint)")
+    parser.add_argument('--language', default="English", help="Summary language (default: English)")
+    parser.add_argument('--user-id', default="bulk", help="userId stored with the summaries (default: bulk)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 2, help="Extraction processes")
+    parser.add_argument('--concurrency', type=int, default=8, help="Concurrent OpenAI calls")
+    parser.add_argument('--store', action='store_true', help="Also bulk-load the summaries into the storage backend")
+    parser.add_argument('--store-batch-size', type=int, default=100, help="Documents per storage bulk load")
+    args = parser.parse_args(argv)
+
+    if not args.dir and not args.urls:
+        parser.error("at least one of --dir or --urls is required")
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    return asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,33 +1,66 @@
 import azure.functions as func
-import logging
 import json
-import os
-from shared.video_processor import extract_video_id, fetch_transcript
-from shared.openai_client import summarize_transcript, summarize_content
-from shared.cosmos_client import save_video_summary, get_video_summary
-from shared.web_scraper import fetch_article_content
+import asyncio
+import contextvars
+from shared.video_processor import extract_video_id, is_valid_video_id, fetch_transcript, split_chapters
+from shared.openai_client import summarize_transcript, summarize_content, summarize_sectioned
+from shared.storage import get_storage
+from shared.web_scraper import fetch_article_content, get_article_id, content_hash
 from shared.pdf_processor import extract_pdf_text
 from shared.text_processor import process_text_input
+from shared.admission import check_admission, current_user
+from shared.prompts import PROMPT_VERSION
+from shared.vector_index import index_summary, search_summaries
+from shared.http_response import json_response, get_includes, slim
 from datetime import datetime
 import base64
+from shared.request_logging import get_logger, log_request, log_task, annotate
+from shared.deadline import DeadlineExceeded, start_deadline, run_stage, run_in_thread, record_progress, check
+
+logger = get_logger(__name__)
 
 app = func.FunctionApp(http_auth_level=func.AuthLevel.ANONYMOUS)
 
+def _rate_limited_response(retry_after: float) -> func.HttpResponse:
+    """429 response telling the client when to retry."""
+    return func.HttpResponse(
+        json.dumps({"error": "Too many requests. Please retry later.", "retryAfter": round(retry_after, 1)}),
+        mimetype="application/json",
+        status_code=429,
+        headers={"Retry-After": str(max(1, int(retry_after + 0.999)))}
+    )
+
+def _deadline_exceeded_response(error: DeadlineExceeded) -> func.HttpResponse:
+    """504 response telling the client which stage the deadline ran out in and how far it got."""
+    return func.HttpResponse(
+        json.dumps({"error": "Request deadline exceeded", "stage": error.stage, "progress": error.progress}),
+        mimetype="application/json",
+        status_code=504
+    )
+
+# In-flight and recently computed chapter summaries, keyed by (video_id, chapter, language).
+# At most _CHAPTER_TASK_LIMIT entries, so in-flight summaries are bounded too.
+_chapter_tasks = {}
+_CHAPTER_TASK_LIMIT = 256
+
 @app.route(route="summarize", methods=["POST"])
+@log_request("summarize")
 async def summarize_video(req: func.HttpRequest) -> func.HttpResponse:
     """
     HTTP trigger function to summarize a video from URL.
     Expects JSON body: { "videoUrl": "https://youtube.com/watch?v=...", "userId": "user123", "language": "English" }
     """
-    logging.info('=== Summarize video function triggered ===')
-
     try:
+        start_deadline(req)
         req_body = req.get_json()
-        logging.info(f'Request body: {req_body}')
         video_url = req_body.get('videoUrl')
         user_id = req_body.get('userId', 'anonymous')
         language = req_body.get('language', 'English')
-        logging.info(f'Processing video URL: {video_url} for user: {user_id} in {language}')
+        annotate(userId=user_id, language=language, videoUrl=video_url)
+
+        retry_after = await check_admission(req, user_id)
+        if retry_after:
+            return _rate_limited_response(retry_after)
 
         if not video_url:
             return func.HttpResponse(
@@ -38,7 +71,7 @@ async def summarize_video(req: func.HttpRequest) -> func.HttpResponse:
 
         # Extract video ID
         video_id = extract_video_id(video_url)
-        logging.info(f'Extracted video ID: {video_id} from URL: {video_url}')
+        annotate(videoId=video_id)
         if not video_id:
             return func.HttpResponse(
                 json.dumps({"error": "Invalid video URL"}),
@@ -46,24 +79,25 @@ async def summarize_video(req: func.HttpRequest) -> func.HttpResponse:
                 status_code=400
             )
 
-        # Check if already processed (skip if COSMOS_ENDPOINT not configured)
-        cosmos_endpoint = os.getenv("COSMOS_ENDPOINT")
-        if cosmos_endpoint:
+        # Check if already processed (skip if STORAGE_BACKEND is "none")
+        storage = get_storage()
+        if storage:
             try:
-                existing_summary = await get_video_summary(video_id, user_id)
-                if existing_summary:
-                    return func.HttpResponse(
-                        json.dumps(existing_summary),
-                        mimetype="application/json",
-                        status_code=200
-                    )
+                existing_summary = await run_stage("cache", storage.get_video_summary(video_id, user_id))
+                # Summaries in another language or from an older prompt version are recomputed
+                existing_meta = (existing_summary or {}).get('summary', {})
+                if (existing_summary
+                        and existing_meta.get('language') == language
+                        and existing_meta.get('promptVersion') == PROMPT_VERSION):
+                    annotate(cache="hit")
+                    return json_response(req, slim(existing_summary, get_includes(req)))
+            except DeadlineExceeded:
+                raise
             except Exception as e:
-                logging.warning(f'Could not check existing summary: {str(e)}')
+                logger.warning('Could not check existing summary: %s', e)
 
         # Fetch transcript
-        logging.info(f'Fetching transcript for video ID: {video_id}')
-        transcript_data = fetch_transcript(video_id)
-        logging.info(f'Transcript fetch result: {transcript_data is not None}')
+        transcript_data = await run_in_thread("extraction", fetch_transcript, video_id, language)
         if not transcript_data:
             error_msg = (
                 "Could not fetch transcript for this video. "
@@ -78,11 +112,13 @@ async def summarize_video(req: func.HttpRequest) -> func.HttpResponse:
             )
 
         transcript_text = transcript_data['text']
+        record_progress(transcriptChars=len(transcript_text))
+        annotate(cache="miss", transcriptChars=len(transcript_text), transcriptLanguage=transcript_data.get('language'))
         
-        # Summarize with OpenAI
-        summary = await summarize_transcript(transcript_text, video_id, language)
+        # Summarize with OpenAI, translating from the caption language in the same call
+        summary = await run_stage("llm", summarize_transcript(transcript_text, video_id, language, transcript_data.get('language')))
         
-        # Save to Cosmos DB (skip if not configured)
+        # Save to storage (skip if not configured)
         video_data = {
             "id": video_id,
             "userId": user_id,
@@ -91,25 +127,34 @@ async def summarize_video(req: func.HttpRequest) -> func.HttpResponse:
             "transcript": transcript_text,
             "summary": summary,
             "timestamps": transcript_data.get('timestamps', []),
+            "transcriptLanguage": transcript_data.get('language'),
             "createdAt": datetime.utcnow().isoformat(),
             "duration": transcript_data.get('duration', 0)
         }
         
-        if cosmos_endpoint:
+        if storage:
+            # Nothing is written once the deadline has passed
+            check("persistence")
             try:
-                await save_video_summary(video_data)
-                logging.info(f'Saved summary to Cosmos DB for video {video_id}')
+                await run_stage("persistence", index_summary(video_data))
+            except DeadlineExceeded:
+                raise
             except Exception as e:
-                logging.warning(f'Could not save to Cosmos DB: {str(e)}')
+                logger.warning('Could not index summary for search: %s', e)
+            try:
+                await run_stage("persistence", storage.save_video_summary(video_data))
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                logger.warning('Could not save summary: %s', e)
 
-        return func.HttpResponse(
-            json.dumps(video_data),
-            mimetype="application/json",
-            status_code=200
-        )
+        return json_response(req, slim(video_data, get_includes(req)))
+
+    except DeadlineExceeded as e:
+        return _deadline_exceeded_response(e)
 
     except Exception as e:
-        logging.error(f"Error processing video: {str(e)}")
+        logger.error("Error processing video: %s", e)
         return func.HttpResponse(
             json.dumps({"error": f"Internal server error: {str(e)}"}),
             mimetype="application/json",
@@ -118,13 +163,13 @@ async def summarize_video(req: func.HttpRequest) -> func.HttpResponse:
 
 
 @app.route(route="history/{userId}", methods=["GET"])
+@log_request("history/{userId}")
 async def get_history(req: func.HttpRequest) -> func.HttpResponse:
     """
     Get user's video summary history.
     """
-    logging.info('Get history function triggered.')
-
     try:
+        start_deadline(req)
         user_id = req.route_params.get('userId')
         
         if not user_id:
@@ -134,17 +179,80 @@ async def get_history(req: func.HttpRequest) -> func.HttpResponse:
                 status_code=400
             )
 
-        from shared.cosmos_client import get_user_history
-        history = await get_user_history(user_id)
+        storage = get_storage()
+        history = await run_stage("history", storage.get_user_history(user_id)) if storage else []
+        annotate(userId=user_id, items=len(history))
+
+        includes = get_includes(req)
+        return json_response(
+            req,
+            {"history": [slim(item, includes) for item in history]},
+            cache_control="private, no-cache"
+        )
+
+    except DeadlineExceeded as e:
+        return _deadline_exceeded_response(e)
 
+    except Exception as e:
+        logger.error("Error fetching history: %s", e)
         return func.HttpResponse(
-            json.dumps({"history": history}),
+            json.dumps({"error": str(e)}),
             mimetype="application/json",
-            status_code=200
+            status_code=500
         )
 
+@app.route(route="search", methods=["POST"])
+@log_request("search")
+async def search(req: func.HttpRequest) -> func.HttpResponse:
+    """
+    Search saved summaries by similarity, or find summaries related to one of the user's summaries.
+    Expects JSON body: { "query": "...", "userId": "user123", "scope": "user", "k": 10 }
+    or { "relatedTo": "<summary id>", "userId": "user123", "scope": "shared" }.
+    scope is "user" (the user's own history, default) or "shared" (all saved summaries).
+    """
+    try:
+        start_deadline(req)
+        req_body = req.get_json()
+        query = req_body.get('query')
+        related_to = req_body.get('relatedTo')
+        user_id = req_body.get('userId', 'anonymous')
+        scope = req_body.get('scope', 'user')
+
+        if not query and not related_to:
+            return func.HttpResponse(
+                json.dumps({"error": "query or relatedTo is required"}),
+                mimetype="application/json",
+                status_code=400
+            )
+        if scope not in ("user", "shared"):
+            return func.HttpResponse(
+                json.dumps({"error": "scope must be 'user' or 'shared'"}),
+                mimetype="application/json",
+                status_code=400
+            )
+        try:
+            k = min(max(int(req_body.get('k', 10)), 1), 100)
+        except (TypeError, ValueError):
+            return func.HttpResponse(
+                json.dumps({"error": "k must be an integer"}),
+                mimetype="application/json",
+                status_code=400
+            )
+
+        retry_after = await check_admission(req, user_id)
+        if retry_after:
+            return _rate_limited_response(retry_after)
+
+        results = await run_stage("search", search_summaries(user_id, query=query, related_to=related_to, scope=scope, k=k))
+        annotate(userId=user_id, scope=scope, results=len(results))
+
+        return json_response(req, {"results": results})
+
+    except DeadlineExceeded as e:
+        return _deadline_exceeded_response(e)
+
     except Exception as e:
-        logging.error(f"Error fetching history: {str(e)}")
+        logger.error("Error searching summaries: %s", e, exc_info=True)
         return func.HttpResponse(
             json.dumps({"error": str(e)}),
             mimetype="application/json",
@@ -152,16 +260,18 @@ async def get_history(req: func.HttpRequest) -> func.HttpResponse:
         )
 
 @app.route(route="test-transcript", methods=["POST"])
+@log_request("test-transcript")
 async def test_transcript(req: func.HttpRequest) -> func.HttpResponse:
     """
     Diagnostic endpoint to test transcript fetching with detailed logging.
     """
-    logging.info('=== Test transcript endpoint triggered ===')
+    logger.info('=== Test transcript endpoint triggered ===')
 
     try:
+        start_deadline(req)
         req_body = req.get_json()
         video_url = req_body.get('videoUrl')
-        logging.info(f'Testing video URL: {video_url}')
+        logger.info('Testing video URL: %s', video_url)
 
         if not video_url:
             return func.HttpResponse(
@@ -172,7 +282,7 @@ async def test_transcript(req: func.HttpRequest) -> func.HttpResponse:
 
         # Extract video ID
         video_id = extract_video_id(video_url)
-        logging.info(f'Extracted video ID: {video_id}')
+        logger.info('Extracted video ID: %s', video_id)
         
         if not video_id:
             return func.HttpResponse(
@@ -182,9 +292,9 @@ async def test_transcript(req: func.HttpRequest) -> func.HttpResponse:
             )
 
         # Try to fetch transcript with detailed logging
-        logging.info(f'Starting transcript fetch for: {video_id}')
-        transcript_data = fetch_transcript(video_id)
-        logging.info(f'Transcript fetch completed. Success: {transcript_data is not None}')
+        logger.info('Starting transcript fetch for: %s', video_id)
+        transcript_data = await run_in_thread("extraction", fetch_transcript, video_id)
+        logger.info('Transcript fetch completed. Success: %s', transcript_data is not None)
         
         if transcript_data:
             return func.HttpResponse(
@@ -200,7 +310,7 @@ async def test_transcript(req: func.HttpRequest) -> func.HttpResponse:
                 status_code=200
             )
         else:
-            logging.error(f'Failed to fetch transcript for {video_id}')
+            logger.error('Failed to fetch transcript for %s', video_id)
             return func.HttpResponse(
                 json.dumps({
                     "success": False,
@@ -211,8 +321,11 @@ async def test_transcript(req: func.HttpRequest) -> func.HttpResponse:
                 status_code=404
             )
 
+    except DeadlineExceeded as e:
+        return _deadline_exceeded_response(e)
+
     except Exception as e:
-        logging.error(f"Error in test endpoint: {str(e)}", exc_info=True)
+        logger.error("Error in test endpoint: %s", e, exc_info=True)
         return func.HttpResponse(
             json.dumps({"error": str(e), "type": type(e).__name__}),
             mimetype="application/json",
@@ -221,19 +334,23 @@ async def test_transcript(req: func.HttpRequest) -> func.HttpResponse:
 
 
 @app.route(route="summarize-article", methods=["POST"])
+@log_request("summarize-article")
 async def summarize_article(req: func.HttpRequest) -> func.HttpResponse:
     """
     HTTP trigger function to summarize a web article from URL.
     Expects JSON body: { "articleUrl": "https://...", "userId": "user123", "language": "English" }
     """
-    logging.info('=== Summarize article function triggered ===')
-
     try:
+        start_deadline(req)
         req_body = req.get_json()
         article_url = req_body.get('articleUrl')
         user_id = req_body.get('userId', 'anonymous')
         language = req_body.get('language', 'English')
 
+        retry_after = await check_admission(req, user_id)
+        if retry_after:
+            return _rate_limited_response(retry_after)
+
         if not article_url:
             return func.HttpResponse(
                 json.dumps({"error": "articleUrl is required"}),
@@ -242,8 +359,8 @@ async def summarize_article(req: func.HttpRequest) -> func.HttpResponse:
             )
 
         # Fetch article content
-        logging.info(f'Fetching article from: {article_url}')
-        article_data = fetch_article_content(article_url)
+        annotate(userId=user_id, language=language, articleUrl=article_url)
+        article_data = await run_in_thread("extraction", fetch_article_content, article_url)
         
         if not article_data:
             return func.HttpResponse(
@@ -252,32 +369,106 @@ async def summarize_article(req: func.HttpRequest) -> func.HttpResponse:
                 status_code=404
             )
 
-        # Summarize with OpenAI
-        logging.info(f'Summarizing article in {language}')
-        summary = await summarize_content(
-            article_data['text'],
+        article_id = get_article_id(article_url)
+        sections = article_data.get('sections') or [
+            {"hash": content_hash(article_data['text']), "text": article_data['text']}
+        ]
+        section_hashes = [section['hash'] for section in sections]
+
+        # Load per-section summaries from a previous run (skip if STORAGE_BACKEND is "none")
+        storage = get_storage()
+        cached_summaries = {}
+        if storage:
+            try:
+                existing_article = await run_stage("cache", storage.get_article_summary(article_id, user_id))
+                if (existing_article
+                        and existing_article.get('language') == language
+                        and existing_article.get('promptVersion') == PROMPT_VERSION):
+                    cached_sections = existing_article.get('sections', [])
+                    if [section['hash'] for section in cached_sections] == section_hashes:
+                        annotate(cache="hit")
+                        return json_response(req, {
+                            "title": existing_article.get('title', 'Untitled'),
+                            "author": existing_article.get('author', 'Unknown'),
+                            "url": article_url,
+                            "summary": existing_article['summary'],
+                            "language": language,
+                            "createdAt": existing_article['createdAt'],
+                            "sectionsReused": len(sections),
+                            "sectionsSummarized": 0
+                        })
+                    # Sections the single-call summary returned no summary for are None
+                    cached_summaries = {
+                        section['hash']: section['summary'] for section in cached_sections if section.get('summary')
+                    }
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                logger.warning('Could not check existing article summary: %s', e)
+
+        # Summarize with OpenAI: in one call (which also returns per-section
+        # summaries) the first time, otherwise only the changed/added sections
+        # (merged with cached ones)
+        record_progress(sections=len(sections), sectionsCached=len(cached_summaries))
+        summary, section_summaries, summarized_count = await run_stage("llm", summarize_sectioned(
+            sections,
+            cached_summaries,
             article_url,
             language,
             "article"
-        )
+        ))
+        reused_count = sum(1 for section_hash in section_hashes if section_hash in cached_summaries)
         
+        annotate(sections=len(sections), sectionsSummarized=summarized_count)
         response_data = {
             "title": article_data.get('title', 'Untitled'),
             "author": article_data.get('author', 'Unknown'),
             "url": article_url,
             "summary": summary,
             "language": language,
-            "createdAt": datetime.utcnow().isoformat()
+            "createdAt": datetime.utcnow().isoformat(),
+            "sectionsReused": reused_count,
+            "sectionsSummarized": summarized_count
         }
 
-        return func.HttpResponse(
-            json.dumps(response_data),
-            mimetype="application/json",
-            status_code=200
-        )
+        if storage:
+            check("persistence")
+            article_document = {
+                "id": article_id,
+                "userId": user_id,
+                "contentType": "article",
+                "title": response_data['title'],
+                "author": response_data['author'],
+                "url": article_url,
+                "summary": summary,
+                "language": language,
+                "promptVersion": PROMPT_VERSION,
+                "createdAt": response_data['createdAt'],
+                "sections": [
+                    {"hash": section['hash'], "summary": section_summary}
+                    for section, section_summary in zip(sections, section_summaries)
+                ]
+            }
+            try:
+                await run_stage("persistence", index_summary(article_document))
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                logger.warning('Could not index summary for search: %s', e)
+            try:
+                await run_stage("persistence", storage.save_article_summary(article_document))
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                logger.warning('Could not save article summary: %s', e)
+
+        return json_response(req, response_data)
+
+    except DeadlineExceeded as e:
+        return _deadline_exceeded_response(e)
 
     except Exception as e:
-        logging.error(f"Error summarizing article: {str(e)}", exc_info=True)
+        logger.error("Error summarizing article: %s", e, exc_info=True)
         return func.HttpResponse(
             json.dumps({"error": str(e)}),
             mimetype="application/json",
@@ -286,19 +477,23 @@ async def summarize_article(req: func.HttpRequest) -> func.HttpResponse:
 
 
 @app.route(route="summarize-text", methods=["POST"])
+@log_request("summarize-text")
 async def summarize_text(req: func.HttpRequest) -> func.HttpResponse:
     """
     HTTP trigger function to summarize direct text input.
     Expects JSON body: { "text": "...", "userId": "user123", "language": "English" }
     """
-    logging.info('=== Summarize text function triggered ===')
-
     try:
+        start_deadline(req)
         req_body = req.get_json()
         text_content = req_body.get('text')
         user_id = req_body.get('userId', 'anonymous')
         language = req_body.get('language', 'English')
 
+        retry_after = await check_admission(req, user_id)
+        if retry_after:
+            return _rate_limited_response(retry_after)
+
         if not text_content:
             return func.HttpResponse(
                 json.dumps({"error": "text is required"}),
@@ -317,13 +512,13 @@ async def summarize_text(req: func.HttpRequest) -> func.HttpResponse:
             )
 
         # Summarize with OpenAI
-        logging.info(f'Summarizing text input in {language}')
-        summary = await summarize_content(
+        annotate(userId=user_id, language=language, wordCount=text_data['word_count'])
+        summary = await run_stage("llm", summarize_content(
             text_data['text'],
             f"text_{user_id}",
             language,
             "text"
-        )
+        ))
         
         response_data = {
             "word_count": text_data['word_count'],
@@ -333,14 +528,13 @@ async def summarize_text(req: func.HttpRequest) -> func.HttpResponse:
             "createdAt": datetime.utcnow().isoformat()
         }
 
-        return func.HttpResponse(
-            json.dumps(response_data),
-            mimetype="application/json",
-            status_code=200
-        )
+        return json_response(req, response_data)
+
+    except DeadlineExceeded as e:
+        return _deadline_exceeded_response(e)
 
     except Exception as e:
-        logging.error(f"Error summarizing text: {str(e)}", exc_info=True)
+        logger.error("Error summarizing text: %s", e, exc_info=True)
         return func.HttpResponse(
             json.dumps({"error": str(e)}),
             mimetype="application/json",
@@ -349,20 +543,24 @@ async def summarize_text(req: func.HttpRequest) -> func.HttpResponse:
 
 
 @app.route(route="summarize-pdf", methods=["POST"])
+@log_request("summarize-pdf")
 async def summarize_pdf(req: func.HttpRequest) -> func.HttpResponse:
     """
     HTTP trigger function to summarize a PDF file.
     Expects JSON body: { "pdfBase64": "...", "filename": "doc.pdf", "userId": "user123", "language": "English" }
     """
-    logging.info('=== Summarize PDF function triggered ===')
-
     try:
+        start_deadline(req)
         req_body = req.get_json()
         pdf_base64 = req_body.get('pdfBase64')
         filename = req_body.get('filename', 'document.pdf')
         user_id = req_body.get('userId', 'anonymous')
         language = req_body.get('language', 'English')
 
+        retry_after = await check_admission(req, user_id)
+        if retry_after:
+            return _rate_limited_response(retry_after)
+
         if not pdf_base64:
             return func.HttpResponse(
                 json.dumps({"error": "pdfBase64 is required"}),
@@ -381,8 +579,8 @@ async def summarize_pdf(req: func.HttpRequest) -> func.HttpResponse:
             )
 
         # Extract text from PDF
-        logging.info(f'Extracting text from PDF: {filename}')
-        pdf_data = extract_pdf_text(pdf_bytes, filename)
+        annotate(userId=user_id, language=language, filename=filename, pdfBytes=len(pdf_bytes))
+        pdf_data = await run_in_thread("extraction", extract_pdf_text, pdf_bytes, filename)
         
         if not pdf_data:
             return func.HttpResponse(
@@ -392,13 +590,13 @@ async def summarize_pdf(req: func.HttpRequest) -> func.HttpResponse:
             )
 
         # Summarize with OpenAI
-        logging.info(f'Summarizing PDF in {language}')
-        summary = await summarize_content(
+        annotate(pages=pdf_data['pages'])
+        summary = await run_stage("llm", summarize_content(
             pdf_data['text'],
             filename,
             language,
             "pdf"
-        )
+        ))
         
         response_data = {
             "filename": pdf_data['filename'],
@@ -408,14 +606,275 @@ async def summarize_pdf(req: func.HttpRequest) -> func.HttpResponse:
             "createdAt": datetime.utcnow().isoformat()
         }
 
+        return json_response(req, response_data)
+
+    except DeadlineExceeded as e:
+        return _deadline_exceeded_response(e)
+
+    except Exception as e:
+        logger.error("Error summarizing PDF: %s", e, exc_info=True)
         return func.HttpResponse(
-            json.dumps(response_data),
+            json.dumps({"error": str(e)}),
             mimetype="application/json",
-            status_code=200
+            status_code=500
         )
 
+
+async def _load_chapters(video_id: str, language: str = "English"):
+    """
+    Load a video's chapter index, from storage when available,
+    otherwise by fetching the transcript (preferring language) and splitting it into chapters.
+    """
+    storage = get_storage()
+    if storage:
+        cached_chapters = await run_stage("cache", storage.get_video_chapters(video_id))
+        if cached_chapters:
+            return cached_chapters
+
+    transcript_data = await run_in_thread("extraction", fetch_transcript, video_id, language)
+    if not transcript_data:
+        return None
+
+    chapters_data = {
+        "language": transcript_data.get('language'),
+        "duration": transcript_data.get('duration', 0),
+        "chapters": split_chapters(transcript_data['timestamps'], transcript_data.get('duration', 0))
+    }
+
+    if storage:
+        check("persistence")
+        try:
+            await run_stage("persistence", storage.save_video_chapters(video_id, chapters_data))
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            logger.warning('Could not save chapters: %s', e)
+
+    return chapters_data
+
+
+@log_task("chapter-summary")
+async def _summarize_chapter(video_id: str, chapter: dict, language: str, source_language: str = None) -> dict:
+    """
+    Summarize one chapter, reusing the stored summary when configured.
+    Runs as a task shared by all requests for the chapter, so it gets its own
+    default deadline instead of the budget of whichever request started it.
+    """
+    start_deadline()
+    annotate(videoId=video_id, chapter=chapter['index'], language=language)
+    storage = get_storage()
+    if storage:
+        cached_summary = await run_stage("cache", storage.get_chapter_summary(video_id, chapter['index'], language))
+        if cached_summary and cached_summary.get('promptVersion') == PROMPT_VERSION:
+            return cached_summary
+
+    summary = await run_stage("llm", summarize_content(
+        chapter['text'],
+        f"{video_id}#chapter{chapter['index']}",
+        language,
+        "video chapter",
+        source_language
+    ))
+
+    if storage:
+        check("persistence")
+        try:
+            await run_stage("persistence", storage.save_chapter_summary(video_id, chapter['index'], language, summary))
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            logger.warning('Could not save chapter summary: %s', e)
+
+    return summary
+
+
+def _log_chapter_task_error(task: asyncio.Task):
+    """Log failures of chapter summaries nobody is awaiting (background prefetch)."""
+    if not task.cancelled() and task.exception():
+        logger.warning('Chapter summary failed: %s', task.exception())
+
+
+def _get_chapter_task(video_id: str, chapter: dict, language: str, source_language: str = None):
+    """
+    Get the task computing a chapter summary, starting it if needed.
+    Concurrent requests (and background prefetch) for the same chapter share one task.
+    Returns None when _CHAPTER_TASK_LIMIT summaries are already in flight.
+    """
+    key = (video_id, chapter['index'], language)
+    task = _chapter_tasks.get(key)
+    if task is None or (task.done() and (task.cancelled() or task.exception())):
+        # Evict the oldest finished entries to make room
+        if len(_chapter_tasks) >= _CHAPTER_TASK_LIMIT:
+            for old_key in [k for k, t in _chapter_tasks.items() if t.done()]:
+                del _chapter_tasks[old_key]
+                if len(_chapter_tasks) < _CHAPTER_TASK_LIMIT:
+                    break
+        if len(_chapter_tasks) - (key in _chapter_tasks) >= _CHAPTER_TASK_LIMIT:
+            return None
+
+        # The task outlives the request starting it: run it in a fresh context
+        # (no request record or deadline) keeping only the user for fair queueing
+        context = contextvars.Context()
+        context.run(current_user.set, current_user.get())
+        task = asyncio.get_running_loop().create_task(
+            _summarize_chapter(video_id, chapter, language, source_language),
+            context=context
+        )
+        task.add_done_callback(_log_chapter_task_error)
+        _chapter_tasks[key] = task
+
+    return task
+
+
+@app.route(route="chapters", methods=["POST"])
+@log_request("chapters")
+async def get_video_chapter_index(req: func.HttpRequest) -> func.HttpResponse:
+    """
+    HTTP trigger function returning the chapter index of a video.
+    Chapter summaries are computed on demand via GET /chapters/{videoId}/{chapter},
+    or in the background when "prefetch" is true.
+    Expects JSON body: { "videoUrl": "https://youtube.com/watch?v=...", "userId": "user123", "language": "English", "prefetch": false }
+    """
+    try:
+        start_deadline(req)
+        req_body = req.get_json()
+        video_url = req_body.get('videoUrl')
+        user_id = req_body.get('userId', 'anonymous')
+        language = req_body.get('language', 'English')
+        prefetch = bool(req_body.get('prefetch', False))
+
+        retry_after = await check_admission(req, user_id)
+        if retry_after:
+            return _rate_limited_response(retry_after)
+
+        if not video_url:
+            return func.HttpResponse(
+                json.dumps({"error": "videoUrl is required"}),
+                mimetype="application/json",
+                status_code=400
+            )
+
+        video_id = extract_video_id(video_url)
+        if not video_id:
+            return func.HttpResponse(
+                json.dumps({"error": "Invalid video URL"}),
+                mimetype="application/json",
+                status_code=400
+            )
+
+        annotate(userId=user_id, videoId=video_id, language=language)
+        chapters_data = await _load_chapters(video_id, language)
+        if not chapters_data:
+            return func.HttpResponse(
+                json.dumps({"error": "Could not fetch transcript for this video."}),
+                mimetype="application/json",
+                status_code=404
+            )
+
+        if prefetch:
+            annotate(prefetch=len(chapters_data['chapters']))
+            for chapter in chapters_data['chapters']:
+                if not _get_chapter_task(video_id, chapter, language, chapters_data.get('language')):
+                    logger.warning('Chapter summary limit reached, not prefetching the rest of %s', video_id)
+                    break
+
+        return json_response(req, {
+            "videoId": video_id,
+            "videoUrl": video_url,
+            "duration": chapters_data.get('duration', 0),
+            "language": language,
+            "chapters": [
+                {
+                    "index": chapter['index'],
+                    "start": chapter['start'],
+                    "end": chapter['end'],
+                    "preview": chapter['text'][:200]
+                }
+                for chapter in chapters_data['chapters']
+            ]
+        })
+
+    except DeadlineExceeded as e:
+        return _deadline_exceeded_response(e)
+
+    except Exception as e:
+        logger.error("Error building video chapters: %s", e, exc_info=True)
+        return func.HttpResponse(
+            json.dumps({"error": str(e)}),
+            mimetype="application/json",
+            status_code=500
+        )
+
+
+@app.route(route="chapters/{videoId}/{chapter}", methods=["GET"])
+@log_request("chapters/{videoId}/{chapter}")
+async def get_video_chapter_summary(req: func.HttpRequest) -> func.HttpResponse:
+    """
+    Get the summary of one video chapter, computing and caching it on first request.
+    Query parameters: userId (default anonymous), language (default English).
+    """
+    try:
+        start_deadline(req)
+        video_id = req.route_params.get('videoId')
+        user_id = req.params.get('userId', 'anonymous')
+        language = req.params.get('language', 'English')
+
+        retry_after = await check_admission(req, user_id)
+        if retry_after:
+            return _rate_limited_response(retry_after)
+        if not is_valid_video_id(video_id):
+            return func.HttpResponse(
+                json.dumps({"error": "Invalid video ID"}),
+                mimetype="application/json",
+                status_code=400
+            )
+        try:
+            chapter_index = int(req.route_params.get('chapter'))
+        except (TypeError, ValueError):
+            return func.HttpResponse(
+                json.dumps({"error": "chapter must be an integer"}),
+                mimetype="application/json",
+                status_code=400
+            )
+
+        chapters_data = await _load_chapters(video_id, language)
+        if not chapters_data:
+            return func.HttpResponse(
+                json.dumps({"error": "Could not fetch transcript for this video."}),
+                mimetype="application/json",
+                status_code=404
+            )
+
+        chapters = chapters_data['chapters']
+        if not 0 <= chapter_index < len(chapters):
+            return func.HttpResponse(
+                json.dumps({"error": f"Chapter {chapter_index} not found"}),
+                mimetype="application/json",
+                status_code=404
+            )
+
+        chapter = chapters[chapter_index]
+        annotate(userId=user_id, videoId=video_id, chapter=chapter_index, language=language)
+        task = _get_chapter_task(video_id, chapter, language, chapters_data.get('language'))
+        if not task:
+            return _rate_limited_response(5)
+        # Shield the shared task so a caller giving up (deadline or disconnect) does not cancel it for others
+        summary = await run_stage("llm", asyncio.shield(task))
+
+        return json_response(req, {
+            "videoId": video_id,
+            "chapter": chapter_index,
+            "start": chapter['start'],
+            "end": chapter['end'],
+            "language": language,
+            "summary": summary
+        }, cache_control="public, max-age=86400")
+
+    except DeadlineExceeded as e:
+        return _deadline_exceeded_response(e)
+
     except Exception as e:
-        logging.error(f"Error summarizing PDF: {str(e)}", exc_info=True)
+        logger.error("Error summarizing chapter: %s", e, exc_info=True)
         return func.HttpResponse(
             json.dumps({"error": str(e)}),
             mimetype="application/json",
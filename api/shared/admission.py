@@ -0,0 +1,224 @@
+"""
+Admission control and fair scheduling for the summarize routes.
+
+Requests are admitted against per-user and per-IP token buckets before any
+extraction work is done, and OpenAI calls are dispatched between users with
+weighted fair queuing so one client cannot starve everyone else.
+"""
+import os
+import time
+import heapq
+import asyncio
+import contextvars
+from contextlib import asynccontextmanager
+from shared.request_logging import get_logger
+
+logger = get_logger(__name__)
+
+# Configuration
+user_rate_per_minute = float(os.getenv("RATE_LIMIT_USER_PER_MINUTE", "10"))
+user_burst = float(os.getenv("RATE_LIMIT_USER_BURST", "5"))
+ip_rate_per_minute = float(os.getenv("RATE_LIMIT_IP_PER_MINUTE", "30"))
+ip_burst = float(os.getenv("RATE_LIMIT_IP_BURST", "15"))
+counter_store = os.getenv("RATE_LIMIT_STORE", "memory").lower()
+openai_max_concurrency = int(os.getenv("OPENAI_MAX_CONCURRENCY", "4"))
+
+# User on whose behalf the current request runs (used by the OpenAI scheduler)
+current_user = contextvars.ContextVar("current_user", default="anonymous")
+
+# Local counter store: key -> (tokens, updated_at)
+_local_buckets = {}
+_LOCAL_BUCKET_LIMIT = 10000
+
+
+def get_client_ip(req) -> str:
+    """
+    Client IP as seen by the Functions front end.
+    Only entries added by the platform are trusted: X-Client-IP, otherwise the
+    last X-Forwarded-For entry (earlier entries are sent by the client and can
+    be rotated freely).
+    """
+    client = req.headers.get('x-client-ip', '').strip()
+    if not client:
+        # "spoofed, ..., client" - the front end appends the address it saw
+        client = req.headers.get('x-forwarded-for', '').split(',')[-1].strip()
+    # The address may include a port
+    if client.startswith('['):
+        return client[1:].split(']')[0]
+    if client.count(':') == 1:
+        return client.split(':')[0]
+    return client or 'unknown'
+
+
+def _refill(tokens: float, updated_at: float, now: float, rate_per_minute: float, burst: float) -> float:
+    """Tokens available at `now` for a bucket last seen at `updated_at`."""
+    return min(burst, tokens + (now - updated_at) * rate_per_minute / 60.0)
+
+
+def _retry_after(tokens: float, rate_per_minute: float) -> float:
+    """Seconds until the bucket holds one whole token again."""
+    return max(0.0, (1.0 - tokens) * 60.0 / rate_per_minute)
+
+
+def _take_local(key: str, rate_per_minute: float, burst: float) -> float:
+    """Take one token from a local bucket. Returns 0 when admitted, else seconds to wait."""
+    now = time.monotonic()
+    tokens, updated_at = _local_buckets.get(key, (burst, now))
+    tokens = _refill(tokens, updated_at, now, rate_per_minute, burst)
+
+    if tokens < 1.0:
+        _local_buckets[key] = (tokens, now)
+        return _retry_after(tokens, rate_per_minute)
+
+    _local_buckets[key] = (tokens - 1.0, now)
+    if len(_local_buckets) > _LOCAL_BUCKET_LIMIT:
+        # Drop the oldest half; evicted buckets simply start full again
+        for old_key in list(_local_buckets)[:_LOCAL_BUCKET_LIMIT // 2]:
+            del _local_buckets[old_key]
+    return 0.0
+
+
+async def _take_shared(key: str, rate_per_minute: float, burst: float) -> float:
+    """
+    Take one token from a bucket in the storage backend (shared across instances).
+    Uses optimistic concurrency and fails open if the store is unavailable.
+    """
+    from shared.storage import get_storage, ConflictError
+
+    for _ in range(3):
+        now = time.time()
+        try:
+            storage = get_storage()
+            counter = await storage.get_rate_limit_counter(key)
+            if counter:
+                tokens = _refill(counter['tokens'], counter['updatedAt'], now, rate_per_minute, burst)
+                etag = counter['_etag']
+            else:
+                tokens, etag = burst, None
+
+            if tokens < 1.0:
+                return _retry_after(tokens, rate_per_minute)
+
+            await storage.save_rate_limit_counter(
+                {"id": key, "tokens": tokens - 1.0, "updatedAt": now, "ttl": 3600},
+                etag
+            )
+            return 0.0
+        except ConflictError:
+            # Concurrent update - re-read and try again
+            continue
+        except Exception as e:
+            logger.warning("Rate limit store unavailable, admitting request: %s", e)
+            return 0.0
+
+    logger.warning("Rate limit counter %s contended, admitting request", key)
+    return 0.0
+
+
+async def _take(key: str, rate_per_minute: float, burst: float) -> float:
+    if rate_per_minute <= 0:
+        return 0.0
+    if counter_store == "storage":
+        return await _take_shared(key, rate_per_minute, burst)
+    return _take_local(key, rate_per_minute, burst)
+
+
+async def check_admission(req, user_id: str):
+    """
+    Admit a summarize request for user_id, or reject it before any work is done.
+    On admission the user is recorded for fair scheduling of OpenAI calls.
+
+    Returns:
+        None if admitted, otherwise the number of seconds the client should wait
+    """
+    client_ip = get_client_ip(req)
+
+    retry_after = await _take(f"ip_{client_ip}", ip_rate_per_minute, ip_burst)
+    if not retry_after:
+        retry_after = await _take(f"user_{user_id}", user_rate_per_minute, user_burst)
+
+    if retry_after:
+        logger.warning("Rate limited user %s from %s, retry after %.1fs", user_id, client_ip, retry_after)
+        return retry_after
+
+    current_user.set(user_id)
+    return None
+
+
+class FairScheduler:
+    """
+    Weighted fair queue in front of a fixed number of concurrent slots.
+
+    Each waiting request gets a virtual finish tag of
+    max(virtual_time, user's last tag) + cost / weight; when a slot frees up
+    the request with the smallest tag runs next. A user submitting a bulk
+    loop only competes with their own backlog.
+    """
+
+    def __init__(self, max_concurrency: int):
+        self.max_concurrency = max_concurrency
+        self.active = 0
+        self.virtual_time = 0.0
+        self.last_tag = {}
+        self.waiting = []
+        self.sequence = 0
+
+    def _dispatch(self):
+        while self.waiting and self.active < self.max_concurrency:
+            tag, _, waiter = heapq.heappop(self.waiting)
+            if waiter.done():
+                continue
+            self.virtual_time = tag
+            self.active += 1
+            waiter.set_result(None)
+
+    @asynccontextmanager
+    async def slot(self, user_id: str, cost: float = 1.0, weight: float = 1.0):
+        tag = max(self.virtual_time, self.last_tag.get(user_id, 0.0)) + cost / weight
+        self.last_tag[user_id] = tag
+        self.sequence += 1
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.waiting, (tag, self.sequence, waiter))
+        self._dispatch()
+
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Slot was granted just before cancellation - give it back
+                self.active -= 1
+                self._dispatch()
+            raise
+
+        try:
+            yield
+        finally:
+            self.active -= 1
+            if not self.waiting and self.active == 0:
+                # Idle: forget history so returning users are not penalised
+                self.last_tag.clear()
+                self.virtual_time = 0.0
+            self._dispatch()
+
+
+_scheduler = None
+
+
+def get_scheduler() -> FairScheduler:
+    """Get or create the OpenAI scheduler (one per worker process)."""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = FairScheduler(openai_max_concurrency)
+    return _scheduler
+
+
+def openai_slot(cost: float):
+    """Fair-queued slot for one OpenAI call made on behalf of the current user."""
+    return get_scheduler().slot(current_user.get(), cost)
+
+
+def set_openai_concurrency(max_concurrency: int):
+    """Change the number of concurrent OpenAI calls (e.g. for offline bulk runs)."""
+    global openai_max_concurrency, _scheduler
+    openai_max_concurrency = max_concurrency
+    _scheduler = None
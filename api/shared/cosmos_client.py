@@ -1,15 +1,24 @@
 """
 Azure Cosmos DB client for storing and retrieving video summaries.
+CosmosStorage exposes these functions as a storage backend (see shared/storage.py).
 """
 import os
-import logging
+import asyncio
+from azure.core import MatchConditions
 from azure.cosmos.aio import CosmosClient
+from azure.cosmos.exceptions import CosmosHttpResponseError
 from azure.identity.aio import DefaultAzureCredential
+from shared.request_logging import get_logger
+from shared.storage import SummaryStorage, ConflictError
+
+logger = get_logger(__name__)
 
 # Configuration
 endpoint = os.getenv("COSMOS_ENDPOINT")
 database_name = os.getenv("COSMOS_DATABASE_NAME", "videosummaries")
 container_videos = os.getenv("COSMOS_CONTAINER_VIDEOS", "videos")
+container_transcripts = os.getenv("COSMOS_CONTAINER_TRANSCRIPTS", "transcripts")
+container_ratelimits = os.getenv("COSMOS_CONTAINER_RATELIMITS", "ratelimits")
 
 # Lazy initialization
 _client = None
@@ -40,9 +49,9 @@ async def save_video_summary(video_data: dict):
     try:
         container = await get_container(container_videos)
         await container.upsert_item(video_data)
-        logging.info(f"Saved video summary for {video_data['videoId']}")
+        logger.info("Saved video summary for %s", video_data['videoId'])
     except Exception as e:
-        logging.error(f"Error saving to Cosmos DB: {str(e)}")
+        logger.error("Error saving to Cosmos DB: %s", e)
         raise
 
 async def get_video_summary(video_id: str, user_id: str):
@@ -65,9 +74,68 @@ async def get_video_summary(video_id: str, user_id: str):
         return items[0] if items else None
     
     except Exception as e:
-        logging.error(f"Error fetching from Cosmos DB: {str(e)}")
+        logger.error("Error fetching from Cosmos DB: %s", e)
+        return None
+
+async def bulk_save_summaries(items: list, batch_size: int = 50):
+    """Upsert many summary documents to Cosmos DB, batch_size at a time."""
+    container = await get_container(container_videos)
+    for start in range(0, len(items), batch_size):
+        batch = items[start:start + batch_size]
+        await asyncio.gather(*[container.upsert_item(item) for item in batch])
+    logger.info("Bulk saved %s summaries", len(items))
+
+async def save_article_summary(article_data: dict):
+    """Save article summary (with per-section summaries) to Cosmos DB."""
+    try:
+        container = await get_container(container_videos)
+        await container.upsert_item(article_data)
+        logger.info("Saved article summary for %s", article_data['url'])
+    except Exception as e:
+        logger.error("Error saving to Cosmos DB: %s", e)
+        raise
+
+async def get_article_summary(article_id: str, user_id: str):
+    """Retrieve a previously saved article summary from Cosmos DB."""
+    try:
+        container = await get_container(container_videos)
+        query = "SELECT * FROM c WHERE c.id = @id AND c.userId = @userId"
+        
+        items = []
+        async for item in container.query_items(
+            query=query,
+            parameters=[
+                {"name": "@id", "value": article_id},
+                {"name": "@userId", "value": user_id}
+            ],
+            partition_key=user_id
+        ):
+            items.append(item)
+        
+        return items[0] if items else None
+    
+    except Exception as e:
+        logger.error("Error fetching from Cosmos DB: %s", e)
         return None
 
+async def get_summaries_with_embeddings(since: str = None):
+    """
+    Iterate over saved summaries that have an embedding (used to build the search index),
+    oldest first, only those created after `since` (ISO timestamp) when given.
+    """
+    container = await get_container(container_videos)
+    query = (
+        "SELECT c.id, c.userId, c.contentType, c.title, c.url, c.videoUrl, c.videoId, c.createdAt, "
+        "c.summary, c.embedding FROM c WHERE IS_DEFINED(c.embedding)"
+    )
+    parameters = []
+    if since:
+        query += " AND c.createdAt > @since"
+        parameters.append({"name": "@since", "value": since})
+    query += " ORDER BY c.createdAt"
+    async for item in container.query_items(query=query, parameters=parameters):
+        yield item
+
 async def get_user_history(user_id: str, limit: int = 20):
     """Get user's video summary history."""
     try:
@@ -88,5 +156,149 @@ async def get_user_history(user_id: str, limit: int = 20):
         return items
     
     except Exception as e:
-        logging.error(f"Error fetching history: {str(e)}")
+        logger.error("Error fetching history: %s", e)
         return []
+
+async def _get_transcript_item(item_id: str, video_id: str):
+    """Fetch a single item from the transcripts container (partitioned by videoId)."""
+    container = await get_container(container_transcripts)
+    query = "SELECT * FROM c WHERE c.id = @id"
+    
+    items = []
+    async for item in container.query_items(
+        query=query,
+        parameters=[{"name": "@id", "value": item_id}],
+        partition_key=video_id
+    ):
+        items.append(item)
+    
+    return items[0] if items else None
+
+async def save_video_chapters(video_id: str, chapters_data: dict):
+    """Save a video's chapter index (with chapter text) to Cosmos DB."""
+    try:
+        container = await get_container(container_transcripts)
+        await container.upsert_item({
+            "id": f"{video_id}_chapters",
+            "videoId": video_id,
+            **chapters_data
+        })
+        logger.info("Saved %s chapters for %s", len(chapters_data['chapters']), video_id)
+    except Exception as e:
+        logger.error("Error saving to Cosmos DB: %s", e)
+        raise
+
+async def get_video_chapters(video_id: str):
+    """Retrieve a video's chapter index from Cosmos DB."""
+    try:
+        return await _get_transcript_item(f"{video_id}_chapters", video_id)
+    except Exception as e:
+        logger.error("Error fetching from Cosmos DB: %s", e)
+        return None
+
+async def save_chapter_summary(video_id: str, chapter_index: int, language: str, summary: dict):
+    """Save the summary of one video chapter in one language to Cosmos DB."""
+    try:
+        container = await get_container(container_transcripts)
+        await container.upsert_item({
+            "id": f"{video_id}_chapter_{chapter_index}_{language.lower()}",
+            "videoId": video_id,
+            "chapter": chapter_index,
+            "language": language,
+            "summary": summary
+        })
+        logger.info("Saved chapter %s summary for %s in %s", chapter_index, video_id, language)
+    except Exception as e:
+        logger.error("Error saving to Cosmos DB: %s", e)
+        raise
+
+async def get_chapter_summary(video_id: str, chapter_index: int, language: str):
+    """Retrieve the cached summary of one video chapter from Cosmos DB."""
+    try:
+        item = await _get_transcript_item(
+            f"{video_id}_chapter_{chapter_index}_{language.lower()}", video_id
+        )
+        return item['summary'] if item else None
+    except Exception as e:
+        logger.error("Error fetching from Cosmos DB: %s", e)
+        return None
+
+async def get_rate_limit_counter(key: str):
+    """Retrieve a rate limit counter (including its _etag) from Cosmos DB."""
+    container = await get_container(container_ratelimits)
+    query = "SELECT * FROM c WHERE c.id = @id"
+    
+    items = []
+    async for item in container.query_items(
+        query=query,
+        parameters=[{"name": "@id", "value": key}],
+        partition_key=key
+    ):
+        items.append(item)
+    
+    return items[0] if items else None
+
+async def save_rate_limit_counter(counter: dict, etag: str = None):
+    """
+    Save a rate limit counter to Cosmos DB.
+    When etag is given the write only succeeds if the counter was not modified
+    concurrently (raises CosmosAccessConditionFailedError otherwise).
+    """
+    container = await get_container(container_ratelimits)
+    if etag:
+        await container.replace_item(
+            item=counter['id'],
+            body=counter,
+            etag=etag,
+            match_condition=MatchConditions.IfNotModified
+        )
+    else:
+        await container.create_item(counter)
+
+
+class CosmosStorage(SummaryStorage):
+    """Storage backend using the Cosmos DB functions in this module."""
+
+    async def save_video_summary(self, video_data: dict):
+        await save_video_summary(video_data)
+
+    async def get_video_summary(self, video_id: str, user_id: str):
+        return await get_video_summary(video_id, user_id)
+
+    async def save_article_summary(self, article_data: dict):
+        await save_article_summary(article_data)
+
+    async def get_article_summary(self, article_id: str, user_id: str):
+        return await get_article_summary(article_id, user_id)
+
+    async def bulk_save_summaries(self, items: list):
+        await bulk_save_summaries(items)
+
+    async def get_user_history(self, user_id: str, limit: int = 20):
+        return await get_user_history(user_id, limit)
+
+    def get_summaries_with_embeddings(self, since: str = None):
+        return get_summaries_with_embeddings(since)
+
+    async def save_video_chapters(self, video_id: str, chapters_data: dict):
+        await save_video_chapters(video_id, chapters_data)
+
+    async def get_video_chapters(self, video_id: str):
+        return await get_video_chapters(video_id)
+
+    async def save_chapter_summary(self, video_id: str, chapter_index: int, language: str, summary: dict):
+        await save_chapter_summary(video_id, chapter_index, language, summary)
+
+    async def get_chapter_summary(self, video_id: str, chapter_index: int, language: str):
+        return await get_chapter_summary(video_id, chapter_index, language)
+
+    async def get_rate_limit_counter(self, key: str):
+        return await get_rate_limit_counter(key)
+
+    async def save_rate_limit_counter(self, counter: dict, etag: str = None):
+        try:
+            await save_rate_limit_counter(counter, etag)
+        except CosmosHttpResponseError as e:
+            if e.status_code in (409, 412):
+                raise ConflictError(counter['id'])
+            raise
@@ -0,0 +1,139 @@
+"""
+Per-request deadlines and cooperative cancellation.
+
+Each request gets a time budget from the X-Request-Timeout-Ms header (capped at
+REQUEST_DEADLINE_MAX_SECONDS) or REQUEST_DEADLINE_SECONDS. The deadline is kept
+in a context variable, so it follows the request into tasks and into worker
+threads started with asyncio.to_thread. Every stage (extraction, LLM,
+persistence) runs with whatever budget is left: awaitables are cancelled when
+it runs out, and blocking code in worker threads checks expired() between
+steps and bounds its own I/O timeouts with time_left().
+"""
+import os
+import time
+import asyncio
+import contextvars
+from shared.request_logging import get_logger, annotate
+
+logger = get_logger(__name__)
+
+DEADLINE_HEADER = "X-Request-Timeout-Ms"
+
+# Configuration (defaults stay below the 230s Azure front-end HTTP timeout)
+default_seconds = float(os.getenv("REQUEST_DEADLINE_SECONDS", "200"))
+max_seconds = float(os.getenv("REQUEST_DEADLINE_MAX_SECONDS", "220"))
+
+# Smallest timeout handed to I/O libraries, which reject zero
+MIN_TIMEOUT = 0.05
+
+
+class DeadlineExceeded(Exception):
+    """The request's time budget ran out during a stage."""
+
+    def __init__(self, stage: str, progress: dict = None):
+        super().__init__(f"Deadline exceeded during {stage}")
+        self.stage = stage
+        self.progress = dict(progress or {})
+
+
+class _Deadline:
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+        self.progress = {"completedStages": []}
+
+
+_deadline = contextvars.ContextVar("deadline", default=None)
+
+
+def start_deadline(req=None) -> float:
+    """
+    Start the deadline for the current request (or background task) and return
+    its budget in seconds. Without a request, or without a valid header, the
+    default budget is used.
+    """
+    seconds = default_seconds
+    header = req.headers.get(DEADLINE_HEADER) if req is not None else None
+    if header:
+        try:
+            seconds = float(header) / 1000
+        except ValueError:
+            logger.warning("Ignoring invalid %s header: %s", DEADLINE_HEADER, header)
+    seconds = max(0.0, min(seconds, max_seconds))
+    _deadline.set(_Deadline(seconds))
+    if req is not None:
+        annotate(deadlineMs=round(seconds * 1000))
+    return seconds
+
+
+def remaining():
+    """Seconds left before the current deadline, or None when there is no deadline."""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline.expires_at - time.monotonic()
+
+
+def expired() -> bool:
+    left = remaining()
+    return left is not None and left <= 0
+
+
+def time_left(cap: float) -> float:
+    """An I/O timeout of at most cap seconds that ends no later than the deadline."""
+    left = remaining()
+    if left is None:
+        return cap
+    return max(MIN_TIMEOUT, min(cap, left))
+
+
+def record_progress(**fields):
+    """Record how far the request got; returned with the 504 if the deadline is missed."""
+    deadline = _deadline.get()
+    if deadline is not None:
+        deadline.progress.update(fields)
+
+
+def _exceeded(stage: str) -> DeadlineExceeded:
+    deadline = _deadline.get()
+    annotate(deadlineStage=stage)
+    return DeadlineExceeded(stage, deadline.progress if deadline else None)
+
+
+def check(stage: str):
+    """Raise DeadlineExceeded if the deadline has passed (for loops in blocking code)."""
+    if expired():
+        raise _exceeded(stage)
+
+
+async def run_stage(stage: str, awaitable):
+    """
+    Await a stage with the remaining budget. The awaitable is cancelled when
+    the deadline passes, and is not started at all if it already has.
+    """
+    if expired():
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        raise _exceeded(stage)
+
+    left = remaining()
+    try:
+        result = await asyncio.wait_for(awaitable, left)
+    except asyncio.TimeoutError:
+        if expired():
+            raise _exceeded(stage) from None
+        raise
+
+    deadline = _deadline.get()
+    if deadline is not None and stage not in deadline.progress["completedStages"]:
+        deadline.progress["completedStages"].append(stage)
+    return result
+
+
+async def run_in_thread(stage: str, func, *args):
+    """
+    Run blocking code in a worker thread as a stage. Threads cannot be
+    interrupted: the request stops waiting when the deadline passes and the
+    thread stops at its next check() / time_left()-bounded call.
+    """
+    return await run_stage(stage, asyncio.to_thread(func, *args))
@@ -0,0 +1,106 @@
+"""
+Hedged requests for tail-latency control.
+
+If a call has not returned after a delay taken from a high percentile of
+recent latencies, a duplicate is sent to a second backend and whichever
+finishes first wins; the other is cancelled. Hedges are only issued while the
+extra spend stays within a budget fraction of the primary spend.
+"""
+import time
+import asyncio
+from collections import deque
+from shared.request_logging import get_logger, increment
+
+logger = get_logger(__name__)
+
+
+class LatencyTracker:
+    """Rolling window of recent call latencies."""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.samples = deque(maxlen=window)
+        self.min_samples = min_samples
+
+    def record(self, seconds: float):
+        self.samples.append(seconds)
+
+    def percentile(self, percentile: float):
+        """Latency at the given percentile, or None until enough samples are recorded."""
+        if len(self.samples) < self.min_samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * percentile / 100))]
+
+
+class HedgingBudget:
+    """Caps hedge spend at a fraction of primary spend (in estimated tokens)."""
+
+    def __init__(self, fraction: float):
+        self.fraction = fraction
+        self.primary_spend = 0.0
+        self.hedge_spend = 0.0
+
+    def record_primary(self, cost: float):
+        self.primary_spend += cost
+
+    def try_spend(self, cost: float) -> bool:
+        if self.hedge_spend + cost > self.fraction * self.primary_spend:
+            return False
+        self.hedge_spend += cost
+        return True
+
+
+async def _cancel(tasks):
+    for task in tasks:
+        task.cancel()
+    # Let cancellation run so the underlying HTTP requests are closed
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def hedged_call(primary, hedge, cost: float, tracker: LatencyTracker, budget: HedgingBudget,
+                      percentile: float = 95, default_delay: float = 10.0, min_delay: float = 1.0):
+    """
+    Await primary(); if it is slower than the tracked percentile latency, also
+    start hedge() and return whichever result arrives first.
+
+    Args:
+        primary, hedge: Zero-argument coroutine functions making the same request
+        cost: Estimated cost of one call, charged against the hedging budget
+        tracker: Latency history used to pick the hedge delay
+        budget: Hedging budget shared by all calls
+        percentile: Latency percentile after which a hedge is sent
+        default_delay: Hedge delay used until enough latencies are recorded
+        min_delay: Lower bound for the hedge delay
+    """
+    delay = max(min_delay, tracker.percentile(percentile) or default_delay)
+    budget.record_primary(cost)
+
+    started = time.monotonic()
+    primary_task = asyncio.ensure_future(primary())
+    tasks = {primary_task}
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if not done:
+            if budget.try_spend(cost):
+                logger.info("Hedging call after %.1fs", delay)
+                increment(hedges=1)
+                tasks.add(asyncio.ensure_future(hedge()))
+            else:
+                logger.info("Hedging budget exhausted, waiting for primary call")
+
+        # First successful result wins; a failure only counts once all calls have failed
+        pending = set(tasks)
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    # When the hedge wins this is a lower bound of the primary's latency
+                    tracker.record(time.monotonic() - started)
+                    if task is not primary_task:
+                        increment(hedgeWins=1)
+                    return task.result()
+                error = error or task.exception()
+        raise error
+    finally:
+        await _cancel([task for task in tasks if not task.done()])
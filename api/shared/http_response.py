@@ -0,0 +1,102 @@
+"""
+HTTP response helpers: fast JSON encoding, slim payloads, compression and ETags.
+"""
+import gzip
+import hashlib
+import json
+import azure.functions as func
+from shared.request_logging import get_logger
+
+logger = get_logger(__name__)
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies smaller than this are sent uncompressed (not worth the CPU)
+MIN_COMPRESS_BYTES = 1024
+
+# Heavy fields left out of responses unless requested with ?include=<name>
+OPTIONAL_FIELDS = {
+    'transcript': ('transcript', 'timestamps'),
+    'sections': ('sections',),
+    'embedding': ('embedding',),
+}
+
+
+def dumps(data) -> bytes:
+    """Serialize to compact JSON bytes, using orjson when installed."""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def get_includes(req: func.HttpRequest) -> set:
+    """Optional field groups requested with ?include=transcript,sections."""
+    include = req.params.get('include', '')
+    return {name.strip().lower() for name in include.split(',') if name.strip()}
+
+
+def slim(item: dict, includes: set) -> dict:
+    """Copy of item without the heavy optional fields that were not requested."""
+    omitted = [
+        field
+        for name, fields in OPTIONAL_FIELDS.items() if name not in includes
+        for field in fields
+    ]
+    if not any(field in item for field in omitted):
+        return item
+    return {key: value for key, value in item.items() if key not in omitted}
+
+
+def _choose_encoding(req: func.HttpRequest) -> str:
+    accept = req.headers.get('accept-encoding', '').lower()
+    if brotli is not None and 'br' in accept:
+        return 'br'
+    if 'gzip' in accept:
+        return 'gzip'
+    return 'identity'
+
+
+def json_response(req: func.HttpRequest, data, status_code: int = 200, cache_control: str = None) -> func.HttpResponse:
+    """
+    Build a JSON response with gzip/brotli compression of large bodies.
+    GET responses also get a strong ETag and If-None-Match handling (304 is
+    only defined for GET and HEAD; POST routes get no ETag).
+    """
+    body = dumps(data)
+    encoding = _choose_encoding(req) if len(body) >= MIN_COMPRESS_BYTES else 'identity'
+
+    headers = {"Vary": "Accept-Encoding"}
+    if cache_control:
+        headers["Cache-Control"] = cache_control
+
+    if (req.method or '').upper() in ('GET', 'HEAD') and status_code == 200:
+        # Strong ETags are per representation, so the encoding is part of the tag
+        etag = f'"{hashlib.sha256(body).hexdigest()[:32]}-{encoding}"'
+        headers["ETag"] = etag
+        if_none_match = req.headers.get('if-none-match', '')
+        if if_none_match and (if_none_match.strip() == '*' or etag in [t.strip() for t in if_none_match.split(',')]):
+            return func.HttpResponse(status_code=304, headers=headers)
+
+    if encoding == 'br':
+        body = brotli.compress(body, quality=5)
+        headers["Content-Encoding"] = "br"
+    elif encoding == 'gzip':
+        # mtime=0 keeps the bytes identical for the same body (the ETag is strong)
+        body = gzip.compress(body, compresslevel=6, mtime=0)
+        headers["Content-Encoding"] = "gzip"
+
+    logger.debug("JSON response: %s bytes (%s)", len(body), encoding)
+    return func.HttpResponse(
+        body,
+        mimetype="application/json",
+        status_code=status_code,
+        headers=headers
+    )
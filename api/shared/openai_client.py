@@ -2,17 +2,52 @@
 Azure OpenAI client for summarizing content and translating to multiple languages.
 """
 import os
-import logging
+import asyncio
 from openai import AsyncAzureOpenAI
 from azure.identity import DefaultAzureCredential, get_bearer_token_provider
+from shared.admission import openai_slot
+from shared.hedging import LatencyTracker, HedgingBudget, hedged_call
+from shared.deadline import time_left, record_progress
+from shared.prompts import PROMPT_VERSION, SECTIONS_INSTRUCTION, build_messages
+from shared.request_logging import get_logger, increment
+
+logger = get_logger(__name__)
 
 # Configuration
 endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
 deployment = os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME", "gpt-4o")
+embedding_deployment = os.getenv("AZURE_OPENAI_EMBEDDING_DEPLOYMENT_NAME", "text-embedding-3-small")
+embedding_dimensions = int(os.getenv("AZURE_OPENAI_EMBEDDING_DIMENSIONS", "256"))
+# Cached-token usage details need 2024-10-21 or later
+api_version = os.getenv("AZURE_OPENAI_API_VERSION", "2024-10-21")
+request_timeout = float(os.getenv("AZURE_OPENAI_TIMEOUT_SECONDS", "60"))
+
+# Hedged requests: duplicate slow calls to a second deployment (optionally on another resource)
+hedge_enabled = os.getenv("OPENAI_HEDGE_ENABLED", "false").lower() == "true"
+hedge_endpoint = os.getenv("AZURE_OPENAI_HEDGE_ENDPOINT") or endpoint
+hedge_deployment = os.getenv("AZURE_OPENAI_HEDGE_DEPLOYMENT_NAME") or deployment
+hedge_percentile = float(os.getenv("OPENAI_HEDGE_PERCENTILE", "95"))
+hedge_default_delay = float(os.getenv("OPENAI_HEDGE_DEFAULT_DELAY_SECONDS", "10"))
+hedge_budget = float(os.getenv("OPENAI_HEDGE_BUDGET", "0.1"))
+if hedge_enabled and hedge_endpoint == endpoint and hedge_deployment == deployment:
+    # A hedge to the same deployment adds load to the slow backend instead of avoiding it
+    logger.warning("OPENAI_HEDGE_ENABLED is set but the hedge target is the primary deployment; hedging disabled")
+    hedge_enabled = False
+
+# Longest content sent in one summarization call (longer content is truncated)
+MAX_CONTENT_CHARS = 12000
+
+# Completion tokens for a summary, plus this many per section when section summaries are returned too
+SUMMARY_MAX_TOKENS = 1500
+SECTION_MAX_TOKENS = 400
+MAX_COMPLETION_TOKENS = 4096
 
 # Lazy initialization
 _client = None
+_hedge_client = None
 _token_provider = None
+_latency = LatencyTracker()
+_hedging_budget = HedgingBudget(hedge_budget)
 
 def get_client():
     """Get or create Azure OpenAI client."""
@@ -27,11 +62,66 @@ def get_client():
         _client = AsyncAzureOpenAI(
             azure_endpoint=endpoint,
             azure_ad_token_provider=_token_provider,
-            api_version="2024-02-01"
+            api_version=api_version,
+            timeout=request_timeout
         )
     return _client
 
-async def summarize_content(content: str, content_id: str, target_language: str = "English", content_type: str = "content") -> dict:
+def get_hedge_client():
+    """Get or create the client used for hedged calls (the primary client when on the same resource)."""
+    global _hedge_client
+    if hedge_endpoint == endpoint:
+        return get_client()
+    if _hedge_client is None:
+        get_client()
+        _hedge_client = AsyncAzureOpenAI(
+            azure_endpoint=hedge_endpoint,
+            azure_ad_token_provider=_token_provider,
+            api_version=api_version,
+            timeout=request_timeout
+        )
+    return _hedge_client
+
+async def create_chat_completion(messages: list, cost: float, **kwargs):
+    """
+    Create a chat completion, hedging slow calls to the second deployment when enabled.
+    cost is the estimated token count of the call (used for the hedging budget).
+    Callers hold an openai_slot for the primary call; a hedge queues for a slot
+    of its own, so OPENAI_MAX_CONCURRENCY also bounds hedges.
+    """
+    # Each attempt is bounded by the request deadline as well as the client timeout
+    kwargs.setdefault('timeout', time_left(request_timeout))
+
+    async def primary():
+        return await get_client().chat.completions.create(model=deployment, messages=messages, **kwargs)
+
+    if not hedge_enabled:
+        return await primary()
+
+    async def hedge():
+        # A second in-flight call; cancelled while queued if the primary returns first
+        async with openai_slot(cost):
+            return await get_hedge_client().chat.completions.create(model=hedge_deployment, messages=messages, **kwargs)
+
+    return await hedged_call(
+        primary, hedge, cost, _latency, _hedging_budget,
+        percentile=hedge_percentile, default_delay=hedge_default_delay
+    )
+
+def log_usage(response, content_id: str):
+    """Log token usage, including prompt tokens served from the prompt cache."""
+    usage = getattr(response, 'usage', None)
+    if usage is None:
+        return
+    details = getattr(usage, 'prompt_tokens_details', None)
+    cached_tokens = (getattr(details, 'cached_tokens', None) or 0) if details else 0
+    logger.info(
+        "OpenAI usage for %s: prompt=%s cached=%s completion=%s",
+        content_id, usage.prompt_tokens, cached_tokens, usage.completion_tokens
+    )
+    increment(promptTokens=usage.prompt_tokens, cachedTokens=cached_tokens, completionTokens=usage.completion_tokens)
+
+async def summarize_content(content: str, content_id: str, target_language: str = "English", content_type: str = "content", source_language: str = None, instructions: str = None, max_tokens: int = SUMMARY_MAX_TOKENS) -> dict:
     """
     Summarize content using Azure OpenAI GPT-4 and translate to target language.
     
@@ -40,49 +130,35 @@ async def summarize_content(content: str, content_id: str, target_language: str
         content_id: Identifier for logging
         target_language: Target language for summary (English, French, German, Spanish, Japanese, Hindi, etc.)
         content_type: Type of content (video, article, text, pdf) for context
+        source_language: Language of the content, when known (e.g. a video's caption language)
+        instructions: Extra instructions for this call (see shared/prompts.py)
+        max_tokens: Completion token limit
         
     Returns:
         Structured summary with key points, topics, and action items in the target language
     """
     try:
-        client = get_client()
+        get_client()
         # Truncate if too long (stay within token limits)
-        max_chars = 12000
-        if len(content) > max_chars:
-            content = content[:max_chars] + "..."
-            logging.warning(f"Content truncated for {content_id}")
-
-        # Build prompt based on language
-        language_instruction = ""
-        if target_language.lower() != "english":
-            language_instruction = f"\n\nIMPORTANT: Provide the ENTIRE response in {target_language}. All sections must be in {target_language}."
-
-        prompt = f"""Analyze the following {content_type} content and provide a structured summary:
-
-Content:
-{content}
-
-Please provide:
-1. Executive Summary (2-3 sentences)
-2. Key Topics (bullet points)
-3. Main Takeaways (3-5 points)
-4. Action Items (if any){language_instruction}
-
-Format the response as JSON with keys: executive_summary, key_topics (array), main_takeaways (array), action_items (array)"""
-
-        system_message = f"You are an expert at analyzing and summarizing content. Provide clear, actionable summaries."
-        if target_language.lower() != "english":
-            system_message += f" Respond ONLY in {target_language}."
-
-        response = await client.chat.completions.create(
-            model=deployment,
-            messages=[
-                {"role": "system", "content": system_message},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7,
-            max_tokens=1500
-        )
+        if len(content) > MAX_CONTENT_CHARS:
+            content = content[:MAX_CONTENT_CHARS] + "..."
+            logger.warning("Content truncated for %s", content_id)
+
+        # Stable prefix first, variable content last (see shared/prompts.py)
+        messages = build_messages(content, content_type, target_language, source_language, instructions)
+        prompt_chars = sum(len(message["content"]) for message in messages)
+
+        # Queue fairly between users; cost is roughly prompt + completion tokens
+        cost = prompt_chars / 4 + max_tokens
+        async with openai_slot(cost):
+            response = await create_chat_completion(
+                messages,
+                cost,
+                temperature=0.7,
+                max_tokens=max_tokens
+            )
+
+        log_usage(response, content_id)
 
         summary_text = response.choices[0].message.content
         
@@ -98,18 +174,168 @@ Format the response as JSON with keys: executive_summary, key_topics (array), ma
                 "action_items": []
             }
 
-        # Add language metadata
+        # Add language and prompt version metadata
         summary['language'] = target_language
+        summary['promptVersion'] = PROMPT_VERSION
 
         return summary
 
     except Exception as e:
-        logging.error(f"Error summarizing content: {str(e)}")
+        logger.error("Error summarizing content: %s", e)
         raise Exception(f"OpenAI summarization failed: {str(e)}")
 
 
+async def summarize_sections(sections: list, cached_summaries: dict, content_id: str, target_language: str = "English", content_type: str = "content") -> tuple:
+    """
+    Summarize content sections, reusing cached per-section summaries.
+    
+    Args:
+        sections: List of dicts with 'hash' and 'text' (see web_scraper.split_sections)
+        cached_summaries: Mapping of section hash -> previously computed summary
+        content_id: Identifier for logging
+        target_language: Target language for summary
+        content_type: Type of content (video, article, text, pdf) for context
+        
+    Returns:
+        Tuple of (list of section summaries in order, number of sections summarized)
+    """
+    pending = list({s['hash']: s for s in sections if s['hash'] not in cached_summaries}.values())
+    logger.info("Summarizing %s of %s sections for %s", len(pending), len(sections), content_id)
+
+    completed = 0
+
+    async def summarize_section(section):
+        nonlocal completed
+        summary = await summarize_content(section['text'], f"{content_id}#{section['hash']}", target_language, f"{content_type} section")
+        completed += 1
+        record_progress(sectionsSummarized=completed, sectionsPending=len(pending))
+        return summary
+
+    fresh = await asyncio.gather(*[summarize_section(s) for s in pending])
+    summaries = dict(cached_summaries)
+    summaries.update({s['hash']: summary for s, summary in zip(pending, fresh)})
+
+    return [summaries[s['hash']] for s in sections], len(pending)
+
+async def merge_section_summaries(section_summaries: list, content_id: str, target_language: str = "English", content_type: str = "content") -> dict:
+    """
+    Combine per-section summaries into one structured summary.
+    
+    Only the (small) section summaries are sent to the model, so merging is
+    much cheaper than re-summarizing the full content.
+    
+    Args:
+        section_summaries: List of summaries returned by summarize_content, in document order
+        content_id: Identifier for logging
+        target_language: Target language for summary
+        content_type: Type of content (video, article, text, pdf) for context
+        
+    Returns:
+        Structured summary in the same format as summarize_content
+    """
+    if len(section_summaries) == 1:
+        return dict(section_summaries[0])
+
+    condensed = []
+    for index, section in enumerate(section_summaries, start=1):
+        condensed.append(
+            f"Section {index}:\n"
+            f"Summary: {section.get('executive_summary', '')}\n"
+            f"Topics: {'; '.join(str(t) for t in section.get('key_topics', []))}\n"
+            f"Takeaways: {'; '.join(str(t) for t in section.get('main_takeaways', []))}\n"
+            f"Action items: {'; '.join(str(t) for t in section.get('action_items', []))}"
+        )
+
+    logger.info("Merging %s section summaries for %s", len(section_summaries), content_id)
+    return await summarize_content(
+        "\n\n".join(condensed),
+        content_id,
+        target_language,
+        f"{content_type} (given as per-section summaries)"
+    )
+
+
+async def summarize_sectioned(sections: list, cached_summaries: dict, content_id: str, target_language: str = "English", content_type: str = "content") -> tuple:
+    """
+    Summarize sectioned content, choosing the cheapest path.
+
+    With no reusable section summaries and content that fits in one call, the
+    numbered sections are summarized in a single call that also returns a
+    summary per section, so a later edit only re-summarizes the changed
+    sections. Otherwise changed sections are summarized and merged with the
+    cached ones.
+
+    Args:
+        sections: List of dicts with 'hash' and 'text' (see web_scraper.split_sections)
+        cached_summaries: Mapping of section hash -> previously computed summary
+        content_id: Identifier for logging
+        target_language: Target language for summary
+        content_type: Type of content (video, article, text, pdf) for context
+
+    Returns:
+        Tuple of (summary, list of section summaries in order (None where the
+        model did not return them), number of sections summarized)
+    """
+    if len(sections) == 1:
+        if cached_summaries or len(sections[0]['text']) > MAX_CONTENT_CHARS:
+            return await _summarize_and_merge(sections, cached_summaries, content_id, target_language, content_type)
+        summary = await summarize_content(sections[0]['text'], content_id, target_language, content_type)
+        return summary, [dict(summary)], 1
+
+    content = "\n\n".join(f"Section {index}:\n{section['text']}" for index, section in enumerate(sections, start=1))
+    if not cached_summaries and len(content) <= MAX_CONTENT_CHARS:
+        summary = await summarize_content(
+            content,
+            content_id,
+            target_language,
+            content_type,
+            instructions=SECTIONS_INSTRUCTION,
+            max_tokens=min(MAX_COMPLETION_TOKENS, SUMMARY_MAX_TOKENS + SECTION_MAX_TOKENS * len(sections))
+        )
+        section_summaries = summary.pop('sections', None)
+        if (not isinstance(section_summaries, list) or len(section_summaries) != len(sections)
+                or not all(isinstance(section, dict) for section in section_summaries)):
+            logger.warning("No usable section summaries in single-call summary for %s", content_id)
+            return summary, [None] * len(sections), 0
+        for section in section_summaries:
+            section.update(language=summary['language'], promptVersion=summary['promptVersion'])
+        return summary, section_summaries, len(sections)
+
+    return await _summarize_and_merge(sections, cached_summaries, content_id, target_language, content_type)
+
+
+async def _summarize_and_merge(sections: list, cached_summaries: dict, content_id: str, target_language: str, content_type: str) -> tuple:
+    section_summaries, summarized_count = await summarize_sections(
+        sections, cached_summaries, content_id, target_language, content_type
+    )
+    summary = await merge_section_summaries(section_summaries, content_id, target_language, content_type)
+    return summary, section_summaries, summarized_count
+
+
+async def embed_texts(texts: list) -> list:
+    """
+    Embed texts with the Azure OpenAI embedding deployment.
+    
+    Returns:
+        List of embedding vectors (lists of floats), one per text
+    """
+    try:
+        client = get_client()
+        response = await client.embeddings.create(
+            model=embedding_deployment,
+            input=texts,
+            dimensions=embedding_dimensions,
+            timeout=time_left(request_timeout)
+        )
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+    except Exception as e:
+        logger.error("Error creating embeddings: %s", e)
+        raise Exception(f"OpenAI embedding failed: {str(e)}")
+
+
 # Backward compatibility - keep old function name
-async def summarize_transcript(transcript: str, video_id: str, target_language: str = "English") -> dict:
+async def summarize_transcript(transcript: str, video_id: str, target_language: str = "English", source_language: str = None) -> dict:
     """Legacy function name for backward compatibility."""
-    return await summarize_content(transcript, video_id, target_language, "video")
+    return await summarize_content(transcript, video_id, target_language, "video", source_language)
 
@@ -1,46 +1,52 @@
 """
 PDF processing utilities for extracting text from PDF files.
 """
-import logging
 import PyPDF2
 from io import BytesIO
+from shared.request_logging import get_logger
+from shared.deadline import DeadlineExceeded, check, record_progress
+
+logger = get_logger(__name__)
 
 def extract_pdf_text(pdf_bytes: bytes, filename: str = "document.pdf") -> dict:
     """
     Extract text content from a PDF file.
     Returns dict with 'text' (extracted content), 'pages', and 'filename'.
     """
-    logging.info(f'=== Starting PDF text extraction for: {filename} ===')
+    logger.info('=== Starting PDF text extraction for: %s ===', filename)
     
     try:
         pdf_file = BytesIO(pdf_bytes)
         pdf_reader = PyPDF2.PdfReader(pdf_file)
         
         num_pages = len(pdf_reader.pages)
-        logging.info(f"PDF has {num_pages} pages")
+        logger.info("PDF has %s pages", num_pages)
         
         if num_pages == 0:
-            logging.error("PDF has no pages")
+            logger.error("PDF has no pages")
             return None
         
         # Extract text from all pages
         full_text = []
         for page_num in range(num_pages):
+            # Stop early once the request has given up (runs in a worker thread)
+            record_progress(pagesExtracted=page_num, pages=num_pages)
+            check("extraction")
             try:
                 page = pdf_reader.pages[page_num]
                 text = page.extract_text()
                 if text:
                     full_text.append(text)
             except Exception as e:
-                logging.warning(f"Could not extract text from page {page_num + 1}: {str(e)}")
+                logger.warning("Could not extract text from page %s: %s", page_num + 1, e)
         
         combined_text = '\n\n'.join(full_text)
         
         if not combined_text or len(combined_text) < 50:
-            logging.error(f"Extracted text too short: {len(combined_text)} characters")
+            logger.error("Extracted text too short: %s characters", len(combined_text))
             return None
         
-        logging.info(f"Successfully extracted {len(combined_text)} characters from {num_pages} pages")
+        logger.info("Successfully extracted %s characters from %s pages", len(combined_text), num_pages)
         return {
             'text': combined_text,
             'pages': num_pages,
@@ -48,9 +54,12 @@ def extract_pdf_text(pdf_bytes: bytes, filename: str = "document.pdf") -> dict:
             'source': 'pdf'
         }
         
+    except DeadlineExceeded:
+        logger.warning("PDF extraction stopped at the request deadline")
+        raise
     except PyPDF2.errors.PdfReadError as e:
-        logging.error(f"PDF read error: {str(e)}")
+        logger.error("PDF read error: %s", e)
         return None
     except Exception as e:
-        logging.error(f"Error extracting PDF text: {str(e)}", exc_info=True)
+        logger.error("Error extracting PDF text: %s", e, exc_info=True)
         return None
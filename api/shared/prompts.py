@@ -0,0 +1,60 @@
+"""
+Versioned prompt templates for summarization.
+
+Messages are ordered so every request starts with the same fixed prefix
+(system message + instructions + output format) and the per-request parts
+(language, content type, content) come last. Azure OpenAI caches prompt
+prefixes of at least 1024 tokens, so identical leading tokens are billed and
+processed as cached tokens once a request (for example a long transcript)
+crosses that size. The system message itself is kept short: padding it to
+reach the threshold would add more uncached tokens to every call than the
+cache discount saves.
+
+Bump PROMPT_VERSION whenever a template changes: it is stored with every
+summary and is part of all summary cache keys.
+"""
+
+PROMPT_VERSION = "v6"
+
+SYSTEM_MESSAGE = """You are an expert at analyzing and summarizing content. Provide clear, actionable summaries.
+
+For every piece of content you are given, provide:
+1. Executive Summary (2-3 sentences)
+2. Key Topics (bullet points)
+3. Main Takeaways (3-5 points)
+4. Action Items (if any)
+
+Format the response as JSON with keys: executive_summary, key_topics (array), main_takeaways (array), action_items (array).
+
+The user message states the content type, optionally the content language, the response language and then the content itself. Write the ENTIRE response in the requested response language; all sections must be in that language. Respond with the JSON object only."""
+
+
+# Appended to the user message when the content is given as numbered sections
+# ("Section 1:", "Section 2:", ...) and per-section summaries are needed too
+SECTIONS_INSTRUCTION = (
+    "The content is given as numbered sections. Also add the key sections: an array with one object "
+    "per section, in order, each with the keys executive_summary, key_topics, main_takeaways and "
+    "action_items and covering only that section."
+)
+
+
+def build_messages(content: str, content_type: str, target_language: str, source_language: str = None, instructions: str = None) -> list:
+    """
+    Build chat messages for a summarization request.
+    The system message is identical for all requests; only the user message varies.
+    source_language, when known, tells the model which language the content is in.
+    instructions, when given, are added to the user message ahead of the content.
+    """
+    header = f"Content type: {content_type}\n"
+    if source_language:
+        header += f"Content language: {source_language}\n"
+    header += f"Response language: {target_language}\n"
+    if instructions:
+        header += f"{instructions}\n"
+    return [
+        {"role": "system", "content": SYSTEM_MESSAGE},
+        {
+            "role": "user",
+            "content": f"{header}\nContent:\n{content}"
+        }
+    ]
@@ -0,0 +1,157 @@
+"""
+Logging helpers for the API: module loggers with sampled info logs,
+redaction of large fields and one structured record per request.
+
+Application Insights bills per ingested byte, so:
+- info/debug records from module loggers are sampled (LOG_INFO_SAMPLE_RATE),
+  warnings and errors are always kept;
+- payload fields such as pdfBase64, text and transcript are never logged in
+  full, only their size;
+- each HTTP request emits a single structured "request" record with the
+  route, status, duration and the fields the handler annotated; background
+  tasks shared between requests emit their own "task" record.
+"""
+import os
+import json
+import time
+import random
+import asyncio
+import logging
+import functools
+import contextvars
+
+# Configuration
+info_sample_rate = float(os.getenv("LOG_INFO_SAMPLE_RATE", "0.1"))
+
+# Fields whose values are replaced by their size when logged
+REDACTED_FIELDS = {'pdfBase64', 'text', 'transcript', 'timestamps', 'embedding', 'sections'}
+MAX_LOGGED_CHARS = 200
+
+_request_fields = contextvars.ContextVar("request_fields", default=None)
+_request_logger = logging.getLogger("api.request")
+
+
+class SamplingFilter(logging.Filter):
+    """Keep a random fraction of records below WARNING; keep everything else."""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno >= logging.WARNING or random.random() < self.rate
+
+
+_sampling_filter = SamplingFilter(info_sample_rate)
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Module logger whose info/debug records are sampled."""
+    logger = logging.getLogger(name)
+    if _sampling_filter not in logger.filters:
+        logger.addFilter(_sampling_filter)
+    return logger
+
+
+def redact(value, key: str = None):
+    """Copy of value safe to log: large fields reduced to their size, long strings truncated."""
+    if key in REDACTED_FIELDS and hasattr(value, '__len__'):
+        return f"<{len(value)} {'chars' if isinstance(value, str) else 'items'}>"
+    if isinstance(value, dict):
+        return {k: redact(v, k) for k, v in value.items()}
+    if isinstance(value, list):
+        return [redact(v) for v in value[:10]] + ([f"<{len(value) - 10} more>"] if len(value) > 10 else [])
+    if isinstance(value, str) and len(value) > MAX_LOGGED_CHARS:
+        return value[:MAX_LOGGED_CHARS] + f"...<{len(value)} chars>"
+    return value
+
+
+def annotate(**fields):
+    """Add fields to the current request's structured record."""
+    request_fields = _request_fields.get()
+    if request_fields is not None:
+        request_fields.update(fields)
+
+
+def increment(**counts):
+    """Add to numeric fields of the current request's structured record."""
+    request_fields = _request_fields.get()
+    if request_fields is not None:
+        for key, value in counts.items():
+            request_fields[key] = request_fields.get(key, 0) + value
+
+
+class _JsonRecord:
+    """Serializes lazily, only if the record is actually emitted."""
+
+    def __init__(self, data: dict):
+        self.data = data
+
+    def __str__(self):
+        return json.dumps(self.data, default=str)
+
+
+def log_request(route: str):
+    """
+    Decorator for HTTP handlers: emits one structured record per request
+    (route, status, duration, body size and annotated fields).
+    """
+    def decorator(handler):
+        @functools.wraps(handler)
+        async def wrapper(req, *args, **kwargs):
+            fields = {}
+            token = _request_fields.set(fields)
+            start = time.perf_counter()
+            status_code = 500
+            try:
+                response = await handler(req, *args, **kwargs)
+                status_code = response.status_code
+                return response
+            finally:
+                _request_fields.reset(token)
+                record = {
+                    "route": route,
+                    "method": req.method,
+                    "status": status_code,
+                    "durationMs": round((time.perf_counter() - start) * 1000, 1),
+                    "bodyBytes": len(req.get_body() or b''),
+                    **redact(fields)
+                }
+                level = logging.ERROR if status_code >= 500 else logging.INFO
+                _request_logger.log(level, "request %s", _JsonRecord(record))
+        return wrapper
+    return decorator
+
+
+def log_task(name: str):
+    """
+    Decorator for background coroutines that outlive the request starting them:
+    their annotations (e.g. token usage) go to one structured "task" record
+    instead of the record of whichever request happened to start them.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            fields = {}
+            token = _request_fields.set(fields)
+            start = time.perf_counter()
+            status = "error"
+            try:
+                result = await func(*args, **kwargs)
+                status = "ok"
+                return result
+            except asyncio.CancelledError:
+                status = "cancelled"
+                raise
+            finally:
+                _request_fields.reset(token)
+                record = {
+                    "task": name,
+                    "status": status,
+                    "durationMs": round((time.perf_counter() - start) * 1000, 1),
+                    **redact(fields)
+                }
+                level = logging.WARNING if status == "error" else logging.INFO
+                _request_logger.log(level, "task %s", _JsonRecord(record))
+        return wrapper
+    return decorator
@@ -0,0 +1,235 @@
+"""
+SQLite storage backend for local, edge and test deployments.
+
+Documents are stored as JSON alongside the columns they are looked up by.
+The database runs in WAL mode and every worker thread has its own
+connection, so reads run concurrently with each other and with the single
+writer; only writes are serialized. All statements run on a worker thread so
+the event loop is not blocked.
+"""
+import json
+import time
+import sqlite3
+import asyncio
+import threading
+from shared.storage import SummaryStorage, ConflictError
+from shared.request_logging import get_logger
+
+logger = get_logger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS summaries (
+    user_id TEXT NOT NULL,
+    id TEXT NOT NULL,
+    content_hash TEXT,
+    created_at TEXT NOT NULL,
+    has_embedding INTEGER NOT NULL DEFAULT 0,
+    body TEXT NOT NULL,
+    PRIMARY KEY (user_id, id)
+);
+CREATE INDEX IF NOT EXISTS idx_summaries_user_created ON summaries (user_id, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_summaries_content_hash ON summaries (content_hash, user_id);
+CREATE INDEX IF NOT EXISTS idx_summaries_embedding_created ON summaries (has_embedding, created_at, user_id, id);
+
+CREATE TABLE IF NOT EXISTS transcripts (
+    video_id TEXT NOT NULL,
+    id TEXT NOT NULL,
+    body TEXT NOT NULL,
+    PRIMARY KEY (video_id, id)
+);
+
+CREATE TABLE IF NOT EXISTS rate_limits (
+    id TEXT PRIMARY KEY,
+    version INTEGER NOT NULL,
+    body TEXT NOT NULL
+);
+"""
+
+# Rows read per query when iterating over embeddings
+EMBEDDING_PAGE_SIZE = 500
+
+# Fields the search index needs (see vector_index.summary_metadata), read without the full body
+EMBEDDING_FIELDS = ('contentType', 'title', 'url', 'videoUrl', 'videoId', 'summary', 'embedding')
+
+# Expired rate limit counters are deleted at most this often
+RATE_LIMIT_CLEANUP_SECONDS = 600
+
+
+def _summary_row(document: dict) -> tuple:
+    # Videos are looked up by videoId, other summaries by their id
+    return (
+        document['userId'],
+        document['id'],
+        document.get('videoId') or document['id'],
+        document['createdAt'],
+        1 if document.get('embedding') else 0,
+        json.dumps(document)
+    )
+
+
+class SqliteStorage(SummaryStorage):
+    """Summary storage in a local SQLite database file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.write_lock = threading.Lock()
+        self.local = threading.local()
+        self.last_cleanup = 0.0
+        connection = self._connection()
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript(SCHEMA)
+        logger.info("Opened SQLite storage at %s", path)
+
+    def _connection(self) -> sqlite3.Connection:
+        """This thread's connection, opened on first use."""
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, isolation_level=None, timeout=10)
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self.local.connection = connection
+        return connection
+
+    def _execute(self, sql: str, parameters=(), many: bool = False):
+        connection = self._connection()
+        if sql.lstrip().upper().startswith("SELECT"):
+            return connection.execute(sql, parameters).fetchall()
+
+        with self.write_lock:
+            if many:
+                connection.execute("BEGIN")
+                try:
+                    connection.executemany(sql, parameters)
+                except Exception:
+                    connection.execute("ROLLBACK")
+                    raise
+                connection.execute("COMMIT")
+                return None
+            return connection.execute(sql, parameters).rowcount
+
+    async def _run(self, sql: str, parameters=(), many: bool = False):
+        return await asyncio.to_thread(self._execute, sql, parameters, many)
+
+    async def _upsert_summaries(self, documents: list):
+        await self._run(
+            "INSERT OR REPLACE INTO summaries (user_id, id, content_hash, created_at, has_embedding, body) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [_summary_row(document) for document in documents],
+            many=True
+        )
+
+    async def _get_one(self, sql: str, parameters: tuple):
+        rows = await self._run(sql, parameters)
+        return json.loads(rows[0][0]) if rows else None
+
+    async def save_video_summary(self, video_data: dict):
+        await self._upsert_summaries([video_data])
+        logger.info("Saved video summary for %s", video_data['videoId'])
+
+    async def get_video_summary(self, video_id: str, user_id: str):
+        return await self._get_one(
+            "SELECT body FROM summaries WHERE content_hash = ? AND user_id = ?", (video_id, user_id)
+        )
+
+    async def save_article_summary(self, article_data: dict):
+        await self._upsert_summaries([article_data])
+        logger.info("Saved article summary for %s", article_data['url'])
+
+    async def get_article_summary(self, article_id: str, user_id: str):
+        return await self._get_one(
+            "SELECT body FROM summaries WHERE user_id = ? AND id = ?", (user_id, article_id)
+        )
+
+    async def bulk_save_summaries(self, items: list):
+        await self._upsert_summaries(items)
+        logger.info("Bulk saved %s summaries", len(items))
+
+    async def get_user_history(self, user_id: str, limit: int = 20):
+        rows = await self._run(
+            "SELECT body FROM summaries WHERE user_id = ? ORDER BY created_at DESC LIMIT ?", (user_id, limit)
+        )
+        return [json.loads(row[0]) for row in rows]
+
+    async def get_summaries_with_embeddings(self, since: str = None):
+        # Only the indexed fields are read, one page at a time (keyset pagination),
+        # so transcripts and sections are never loaded
+        fields = ", ".join(f"json_extract(body, '$.{field}')" for field in EMBEDDING_FIELDS)
+        sql = (
+            f"SELECT created_at, user_id, id, {fields} FROM summaries "
+            "WHERE has_embedding = 1 AND (created_at, user_id, id) > (?, ?, ?) "
+            "ORDER BY created_at, user_id, id LIMIT ?"
+        )
+        position = (since or "", "", "")
+        while True:
+            rows = await self._run(sql, (*position, EMBEDDING_PAGE_SIZE))
+            for row in rows:
+                document = {"createdAt": row[0], "userId": row[1], "id": row[2]}
+                # Missing fields are left out, as in the Cosmos projection
+                document.update((field, value) for field, value in zip(EMBEDDING_FIELDS, row[3:]) if value is not None)
+                document['summary'] = json.loads(document.get('summary') or '{}')
+                yield document
+            if len(rows) < EMBEDDING_PAGE_SIZE:
+                return
+            position = rows[-1][:3]
+
+    async def _save_transcript_item(self, video_id: str, item: dict):
+        await self._run(
+            "INSERT OR REPLACE INTO transcripts (video_id, id, body) VALUES (?, ?, ?)",
+            (video_id, item['id'], json.dumps(item))
+        )
+
+    async def save_video_chapters(self, video_id: str, chapters_data: dict):
+        await self._save_transcript_item(video_id, {"id": f"{video_id}_chapters", "videoId": video_id, **chapters_data})
+
+    async def get_video_chapters(self, video_id: str):
+        return await self._get_one(
+            "SELECT body FROM transcripts WHERE video_id = ? AND id = ?", (video_id, f"{video_id}_chapters")
+        )
+
+    async def save_chapter_summary(self, video_id: str, chapter_index: int, language: str, summary: dict):
+        await self._save_transcript_item(video_id, {
+            "id": f"{video_id}_chapter_{chapter_index}_{language.lower()}",
+            "videoId": video_id,
+            "chapter": chapter_index,
+            "language": language,
+            "summary": summary
+        })
+
+    async def get_chapter_summary(self, video_id: str, chapter_index: int, language: str):
+        item = await self._get_one(
+            "SELECT body FROM transcripts WHERE video_id = ? AND id = ?",
+            (video_id, f"{video_id}_chapter_{chapter_index}_{language.lower()}")
+        )
+        return item['summary'] if item else None
+
+    async def get_rate_limit_counter(self, key: str):
+        rows = await self._run("SELECT version, body FROM rate_limits WHERE id = ?", (key,))
+        if not rows:
+            return None
+        return {**json.loads(rows[0][1]), "_etag": str(rows[0][0])}
+
+    async def _delete_expired_counters(self):
+        # Counters carry updatedAt and a ttl (seconds), like the Cosmos per-item ttl
+        now = time.time()
+        if now - self.last_cleanup < RATE_LIMIT_CLEANUP_SECONDS:
+            return
+        self.last_cleanup = now
+        deleted = await self._run(
+            "DELETE FROM rate_limits WHERE json_extract(body, '$.updatedAt') + json_extract(body, '$.ttl') < ?", (now,)
+        )
+        logger.info("Deleted %s expired rate limit counters", deleted)
+
+    async def save_rate_limit_counter(self, counter: dict, etag: str = None):
+        body = json.dumps({key: value for key, value in counter.items() if key != '_etag'})
+        if etag is None:
+            await self._delete_expired_counters()
+            try:
+                await self._run("INSERT INTO rate_limits (id, version, body) VALUES (?, 1, ?)", (counter['id'], body))
+            except sqlite3.IntegrityError:
+                raise ConflictError(counter['id'])
+            return
+        updated = await self._run(
+            "UPDATE rate_limits SET version = version + 1, body = ? WHERE id = ? AND version = ?",
+            (body, counter['id'], int(etag))
+        )
+        if not updated:
+            raise ConflictError(counter['id'])
@@ -0,0 +1,108 @@
+"""
+Storage backend selection for summaries, chapters and rate limit counters.
+
+STORAGE_BACKEND selects the implementation:
+- "cosmos": Azure Cosmos DB (shared/cosmos_client.py), the default when COSMOS_ENDPOINT is set
+- "sqlite": local SQLite file (shared/sqlite_storage.py), the default otherwise
+- "none": no caching or history
+
+The SQLite file defaults to the temp directory, which is writable (and local,
+as WAL mode requires) even when the app runs from a read-only package. If the
+backend cannot be opened the API keeps working without storage.
+"""
+import os
+import tempfile
+from shared.request_logging import get_logger
+
+logger = get_logger(__name__)
+
+# Configuration
+backend = os.getenv("STORAGE_BACKEND") or ("cosmos" if os.getenv("COSMOS_ENDPOINT") else "sqlite")
+sqlite_path = os.getenv("SQLITE_PATH") or os.path.join(tempfile.gettempdir(), "summaries.db")
+
+
+class ConflictError(Exception):
+    """A conditional write lost against a concurrent update."""
+
+
+class SummaryStorage:
+    """
+    Interface implemented by the storage backends.
+    Documents are plain dicts; summaries are keyed by (userId, id), chapter
+    data by videoId and rate limit counters by id.
+    """
+
+    async def save_video_summary(self, video_data: dict):
+        raise NotImplementedError
+
+    async def get_video_summary(self, video_id: str, user_id: str):
+        raise NotImplementedError
+
+    async def save_article_summary(self, article_data: dict):
+        raise NotImplementedError
+
+    async def get_article_summary(self, article_id: str, user_id: str):
+        raise NotImplementedError
+
+    async def bulk_save_summaries(self, items: list):
+        raise NotImplementedError
+
+    async def get_user_history(self, user_id: str, limit: int = 20):
+        raise NotImplementedError
+
+    def get_summaries_with_embeddings(self, since: str = None):
+        """
+        Async iterator over summaries that have an embedding (created after
+        the ISO timestamp `since` when given). Only the fields the search
+        index needs are guaranteed to be present.
+        """
+        raise NotImplementedError
+
+    async def save_video_chapters(self, video_id: str, chapters_data: dict):
+        raise NotImplementedError
+
+    async def get_video_chapters(self, video_id: str):
+        raise NotImplementedError
+
+    async def save_chapter_summary(self, video_id: str, chapter_index: int, language: str, summary: dict):
+        raise NotImplementedError
+
+    async def get_chapter_summary(self, video_id: str, chapter_index: int, language: str):
+        raise NotImplementedError
+
+    async def get_rate_limit_counter(self, key: str):
+        """Counter dict including an opaque '_etag', or None."""
+        raise NotImplementedError
+
+    async def save_rate_limit_counter(self, counter: dict, etag: str = None):
+        """Create (etag None) or conditionally replace a counter; raises ConflictError on a lost race."""
+        raise NotImplementedError
+
+
+# Lazy initialization
+_storage = None
+_storage_failed = False
+
+
+def get_storage():
+    """
+    Get or create the configured storage backend. Returns None when
+    STORAGE_BACKEND is "none" or the backend could not be opened.
+    """
+    global _storage, _storage_failed
+    if _storage is None and not _storage_failed and backend != "none":
+        try:
+            if backend == "cosmos":
+                from shared.cosmos_client import CosmosStorage
+                _storage = CosmosStorage()
+            elif backend == "sqlite":
+                from shared.sqlite_storage import SqliteStorage
+                _storage = SqliteStorage(sqlite_path)
+            else:
+                raise ValueError(f"Unknown STORAGE_BACKEND: {backend}")
+            logger.info("Using %s storage backend", backend)
+        except Exception as e:
+            # Serve summaries without caching or history rather than failing every request
+            logger.warning("Could not open %s storage, continuing without storage: %s", backend, e)
+            _storage_failed = True
+    return _storage
@@ -1,29 +1,31 @@
 """
 Text processing utilities for direct text input.
 """
-import logging
+from shared.request_logging import get_logger
+
+logger = get_logger(__name__)
 
 def process_text_input(text: str) -> dict:
     """
     Process direct text input.
     Returns dict with 'text' and metadata.
     """
-    logging.info(f'=== Processing direct text input ===')
+    logger.info('=== Processing direct text input ===')
     
     if not text or not text.strip():
-        logging.error("Empty text provided")
+        logger.error("Empty text provided")
         return None
     
     text = text.strip()
     
     if len(text) < 50:
-        logging.error(f"Text too short: {len(text)} characters (minimum 50)")
+        logger.error("Text too short: %s characters (minimum 50)", len(text))
         return None
     
     word_count = len(text.split())
     char_count = len(text)
     
-    logging.info(f"Processed text: {char_count} characters, {word_count} words")
+    logger.info("Processed text: %s characters, %s words", char_count, word_count)
     
     return {
         'text': text,
@@ -0,0 +1,353 @@
+"""
+Embedding index for searching and relating saved summaries.
+
+Summaries are embedded when they are saved. The embedding is stored with the
+summary document in storage (base64 float16) and kept in an in-memory
+float16 matrix for search. Per-user searches are exact over that user's rows;
+searches over the shared cache use an inverted-file (IVF) index: rows are
+clustered around ~sqrt(n) k-means centroids and only the closest clusters are
+scanned. The index is persisted to VECTOR_INDEX_PATH when set, and is
+otherwise rebuilt from the storage backend on first use. Every
+VECTOR_INDEX_REFRESH_SECONDS it picks up summaries saved by other instances:
+those created after the newest createdAt of the last load from storage that
+read to the end (a load that fails part way is retried from the same point).
+
+Shared-scope results only cover videos and articles (public URLs), never
+include userId or document ids, and list each piece of content once even
+when several users saved it.
+"""
+import os
+import json
+import time
+import base64
+from datetime import datetime, timedelta
+import numpy as np
+from shared.openai_client import embed_texts
+from shared.storage import get_storage
+from shared.request_logging import get_logger
+
+logger = get_logger(__name__)
+
+# Configuration
+index_path = os.getenv("VECTOR_INDEX_PATH")
+save_every = int(os.getenv("VECTOR_INDEX_SAVE_EVERY", "20"))
+refresh_seconds = float(os.getenv("VECTOR_INDEX_REFRESH_SECONDS", "60"))
+
+# Below this many rows a full scan is as fast as the IVF index
+IVF_MIN_ROWS = 4096
+IVF_NPROBE = 8
+KMEANS_ITERATIONS = 8
+
+# Refreshes re-read this far behind the watermark: createdAt is set before a
+# document is saved, so saves can land slightly out of order
+REFRESH_OVERLAP = timedelta(minutes=5)
+
+# Metadata fields that identify a user or their documents (left out of shared results)
+PRIVATE_FIELDS = ('id', 'userId', 'contentKey')
+
+# Content types searchable in the shared scope; PDFs and pasted text are private to the user
+SHARED_CONTENT_TYPES = ('video', 'article')
+
+
+def encode_vector(vector: np.ndarray) -> str:
+    """Compact string form of an embedding for storage in a document."""
+    return base64.b64encode(np.asarray(vector, dtype=np.float16).tobytes()).decode('ascii')
+
+
+def decode_vector(encoded: str) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(encoded), dtype=np.float16)
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def summary_text(document: dict) -> str:
+    """Text embedded for a summary document."""
+    summary = document.get('summary', {})
+    parts = [
+        document.get('title', ''),
+        summary.get('executive_summary', ''),
+        '; '.join(str(topic) for topic in summary.get('key_topics', [])),
+        '; '.join(str(takeaway) for takeaway in summary.get('main_takeaways', [])),
+    ]
+    return '\n'.join(part for part in parts if part)
+
+
+def summary_metadata(document: dict) -> dict:
+    """Small subset of a summary document returned with search results."""
+    summary = document.get('summary', {})
+    return {
+        "id": document['id'],
+        "userId": document['userId'],
+        # Same video/article saved by different users
+        "contentKey": document.get('videoId') or document.get('url') or document.get('videoUrl') or document['id'],
+        "contentType": document.get('contentType', 'video'),
+        "title": document.get('title'),
+        "url": document.get('url') or document.get('videoUrl'),
+        "createdAt": document.get('createdAt'),
+        "executive_summary": (summary.get('executive_summary') or '')[:300],
+    }
+
+
+def _content_key(metadata: dict) -> str:
+    # Index files written before contentKey existed only have url/id
+    return metadata.get('contentKey') or metadata.get('url') or metadata['id']
+
+
+class VectorIndex:
+    """Float16 embedding matrix with per-user row lists and an optional IVF index."""
+
+    def __init__(self, dimensions: int = 0):
+        self.dimensions = dimensions
+        self.matrix = np.zeros((0, dimensions), dtype=np.float16)
+        # Rows searchable in the shared scope (see SHARED_CONTENT_TYPES)
+        self.shared = np.zeros(0, dtype=bool)
+        self.size = 0
+        self.keys = []
+        self.metadata = []
+        self.rows = {}
+        self.user_rows = {}
+        self.centroids = None
+        self.lists = None
+        self.ivf_size = 0
+        self.unsaved = 0
+        # Newest createdAt of the last complete load from storage (refreshes load documents after it)
+        self.watermark = None
+
+    def add(self, key: str, vector, metadata: dict):
+        """Add or replace the embedding stored under key."""
+        vector = _normalize(vector).astype(np.float16)
+        if self.dimensions == 0:
+            self.dimensions = vector.shape[0]
+            self.matrix = np.zeros((0, self.dimensions), dtype=np.float16)
+        if vector.shape[0] != self.dimensions:
+            raise ValueError(f"Expected {self.dimensions}-dimensional vector, got {vector.shape[0]}")
+
+        row = self.rows.get(key)
+        if row is None:
+            if self.size == self.matrix.shape[0]:
+                # Grow geometrically so appends stay amortised O(1)
+                grown = np.zeros((max(64, self.size * 2), self.dimensions), dtype=np.float16)
+                grown[:self.size] = self.matrix[:self.size]
+                self.matrix = grown
+                shared = np.zeros(grown.shape[0], dtype=bool)
+                shared[:self.size] = self.shared[:self.size]
+                self.shared = shared
+            row = self.size
+            self.size += 1
+            self.rows[key] = row
+            self.keys.append(key)
+            self.metadata.append(metadata)
+            self.user_rows.setdefault(metadata['userId'], []).append(row)
+            if self.lists is not None:
+                nearest = int(np.argmax(self.centroids @ vector.astype(np.float32)))
+                self.lists[nearest] = np.append(self.lists[nearest], row)
+        else:
+            self.metadata[row] = metadata
+
+        self.matrix[row] = vector
+        self.shared[row] = metadata.get('contentType') in SHARED_CONTENT_TYPES
+        self.unsaved += 1
+
+        # Rebuild clusters once the index has doubled since the last build
+        if self.size >= IVF_MIN_ROWS and self.size >= 2 * self.ivf_size:
+            self.build_ivf()
+
+    def get_vector(self, key: str):
+        row = self.rows.get(key)
+        return None if row is None else self.matrix[row].astype(np.float32)
+
+    def build_ivf(self):
+        """Cluster all rows with a few k-means iterations over a sample."""
+        data = self.matrix[:self.size].astype(np.float32)
+        nlist = max(1, int(np.sqrt(self.size)))
+        rng = np.random.default_rng(0)
+        sample = data[rng.choice(self.size, size=min(self.size, nlist * 64), replace=False)]
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)]
+
+        for _ in range(KMEANS_ITERATIONS):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            for cluster in range(nlist):
+                members = sample[assignment == cluster]
+                if len(members):
+                    centroids[cluster] = members.mean(axis=0)
+            centroids = _normalize(centroids)
+
+        assignment = np.argmax(data @ centroids.T, axis=1)
+        self.centroids = centroids
+        self.lists = [np.flatnonzero(assignment == cluster) for cluster in range(nlist)]
+        self.ivf_size = self.size
+        logger.info("Built IVF index with %s lists over %s vectors", nlist, self.size)
+
+    def search(self, vector, k: int = 10, user_id: str = None, exclude_key: str = None, shared_only: bool = False) -> list:
+        """
+        Top-k most similar rows by cosine similarity.
+        Restricted to user_id's rows (exact) when given, otherwise over all rows (IVF when built).
+        shared_only limits the search to rows of SHARED_CONTENT_TYPES.
+        Returns list of (score, metadata) tuples.
+        """
+        if self.size == 0:
+            return []
+        query = _normalize(vector)
+
+        if user_id is not None:
+            candidates = np.asarray(self.user_rows.get(user_id, []), dtype=np.int64)
+        elif self.lists is not None:
+            probe = np.argsort(-(self.centroids @ query))[:IVF_NPROBE]
+            candidates = np.concatenate([self.lists[cluster] for cluster in probe])
+        else:
+            candidates = np.arange(self.size)
+
+        if shared_only:
+            candidates = candidates[self.shared[candidates]]
+        if exclude_key in self.rows:
+            candidates = candidates[candidates != self.rows[exclude_key]]
+        if len(candidates) == 0:
+            return []
+
+        scores = self.matrix[candidates].astype(np.float32) @ query
+        top = np.argpartition(-scores, min(k, len(scores)) - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(float(scores[i]), self.metadata[candidates[i]]) for i in top]
+
+    def save(self, path: str):
+        """Persist atomically to an .npz file."""
+        temp_path = f"{path}.tmp.npz"
+        np.savez(
+            temp_path,
+            matrix=self.matrix[:self.size],
+            keys=np.array(self.keys, dtype=str),
+            metadata=np.array(json.dumps(self.metadata)),
+            watermark=np.array(self.watermark or '')
+        )
+        os.replace(temp_path, path)
+        self.unsaved = 0
+
+    @classmethod
+    def load(cls, path: str) -> "VectorIndex":
+        with np.load(path) as data:
+            matrix = data['matrix']
+            keys = [str(key) for key in data['keys']]
+            metadata = json.loads(str(data['metadata']))
+            # Files written before the watermark was saved get a full load from storage
+            watermark = str(data['watermark']) if 'watermark' in data else ''
+        index = cls(matrix.shape[1])
+        for key, vector, item in zip(keys, matrix, metadata):
+            index.add(key, vector, item)
+        index.unsaved = 0
+        index.watermark = watermark or None
+        return index
+
+
+# Lazy initialization
+_index = None
+_last_refresh = 0.0
+
+
+async def _load_from_storage(index: VectorIndex, storage):
+    """
+    Add embeddings stored with the summaries, only those created since the
+    last complete load when there was one. The watermark only moves once the
+    whole result has been read, so a load that stops early is repeated.
+    """
+    since = None
+    if index.watermark:
+        since = (datetime.fromisoformat(index.watermark) - REFRESH_OVERLAP).isoformat()
+    unsaved = index.unsaved
+    count = 0
+    newest = index.watermark
+    async for document in storage.get_summaries_with_embeddings(since):
+        index.add(f"{document['userId']}/{document['id']}", decode_vector(document['embedding']), summary_metadata(document))
+        count += 1
+        created_at = document.get('createdAt')
+        if created_at and (newest is None or created_at > newest):
+            newest = created_at
+    index.watermark = newest
+    # Documents already in storage do not need saving to the index file
+    index.unsaved = unsaved
+    logger.info("Loaded %s embeddings from storage (since %s)", count, since)
+
+
+async def get_index() -> VectorIndex:
+    """
+    Get the process-wide index, loading it from file or the storage backend on
+    first use and picking up summaries saved by other instances periodically.
+    """
+    global _index, _last_refresh
+    storage = get_storage()
+    if _index is None:
+        index = VectorIndex()
+        if index_path and os.path.exists(index_path):
+            index = VectorIndex.load(index_path)
+            logger.info("Loaded %s embeddings from %s", index.size, index_path)
+        _index = index
+    elif not storage or time.monotonic() - _last_refresh < refresh_seconds:
+        return _index
+
+    if storage:
+        # Set before loading so concurrent callers do not refresh as well
+        _last_refresh = time.monotonic()
+        try:
+            await _load_from_storage(_index, storage)
+        except Exception as e:
+            logger.warning("Could not load embeddings from storage: %s", e)
+    return _index
+
+
+async def index_summary(document: dict):
+    """
+    Embed a summary document, store the embedding on it (so it is saved with
+    the document) and add it to the index.
+    """
+    vector = np.asarray((await embed_texts([summary_text(document)]))[0], dtype=np.float32)
+    document['embedding'] = encode_vector(_normalize(vector))
+
+    index = await get_index()
+    index.add(f"{document['userId']}/{document['id']}", vector, summary_metadata(document))
+    if index_path and index.unsaved >= save_every:
+        index.save(index_path)
+
+
+async def search_summaries(user_id: str, query: str = None, related_to: str = None, scope: str = "user", k: int = 10) -> list:
+    """
+    Search saved summaries by query text, or find summaries related to
+    user_id's document related_to.
+    Scope "user" searches user_id's summaries, "shared" searches everyone's.
+    Returns list of result dicts with 'score' and summary metadata.
+    """
+    index = await get_index()
+
+    exclude_key = None
+    if related_to:
+        exclude_key = f"{user_id}/{related_to}"
+        vector = index.get_vector(exclude_key)
+        if vector is None:
+            return []
+    else:
+        vector = np.asarray((await embed_texts([query]))[0], dtype=np.float32)
+
+    if scope == "user":
+        results = index.search(vector, k, user_id=user_id, exclude_key=exclude_key)
+        return [
+            {"score": round(score, 4), **{key: value for key, value in metadata.items() if key != 'contentKey'}}
+            for score, metadata in results
+        ]
+
+    # Shared scope: videos and articles only, one result per piece of content,
+    # without user identifiers. Over-fetch since several users' copies of the
+    # same content rank together.
+    excluded_content = _content_key(index.metadata[index.rows[exclude_key]]) if exclude_key else None
+    results = []
+    seen = {excluded_content}
+    for score, metadata in index.search(vector, k * 4, exclude_key=exclude_key, shared_only=True):
+        content_key = _content_key(metadata)
+        if content_key in seen:
+            continue
+        seen.add(content_key)
+        results.append({"score": round(score, 4), **{key: value for key, value in metadata.items() if key not in PRIVATE_FIELDS}})
+        if len(results) == k:
+            break
+    return results
@@ -2,9 +2,32 @@
 Video processing utilities for extracting video IDs and fetching transcripts.
 """
 import re
-import logging
+import time
+import threading
+import requests
 from youtube_transcript_api import YouTubeTranscriptApi
 from youtube_transcript_api._errors import TranscriptsDisabled, NoTranscriptFound, RequestBlocked
+from shared.deadline import DeadlineExceeded, check, time_left
+from shared.request_logging import get_logger
+
+logger = get_logger(__name__)
+
+# Cap on a single YouTube HTTP call, further bounded by the request deadline
+YOUTUBE_TIMEOUT_SECONDS = 15
+
+class _DeadlineSession(requests.Session):
+    """Session whose calls time out at the current request's deadline (read per call)."""
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', time_left(YOUTUBE_TIMEOUT_SECONDS))
+        return super().request(method, url, **kwargs)
+
+# Shared by cached transcript lists, which fetch through the session they were listed with
+_youtube_session = _DeadlineSession()
+
+def is_valid_video_id(video_id: str) -> bool:
+    """Check that video_id has the form of a YouTube video ID (11 URL-safe characters)."""
+    return bool(video_id) and re.fullmatch(r'[a-zA-Z0-9_-]{11}', video_id) is not None
 
 def extract_video_id(url: str) -> str:
     """
@@ -26,71 +49,132 @@ def extract_video_id(url: str) -> str:
     
     return None
 
-def fetch_transcript(video_id: str) -> dict:
+# Chapter mode: transcript is split into windows of roughly this length
+CHAPTER_WINDOW_SECONDS = 300
+
+def split_chapters(timestamps: list, duration: float = 0, window_seconds: int = CHAPTER_WINDOW_SECONDS) -> list:
+    """
+    Split timestamped transcript segments into chapters of roughly window_seconds.
+    A chapter is closed at the first segment that starts after the window ends,
+    so chapters never cut a caption in half.
+    Returns list of dicts with 'index', 'start', 'end' and 'text'.
     """
-    Fetch transcript for a YouTube video.
-    Returns dict with 'text' (full transcript) and 'timestamps' (list of segments).
+    chapters = []
+    current = []
+    chapter_start = 0
+
+    for entry in timestamps:
+        if current and entry['time'] - chapter_start >= window_seconds:
+            chapters.append({
+                'index': len(chapters),
+                'start': chapter_start,
+                'end': entry['time'],
+                'text': ' '.join(current)
+            })
+            current = []
+            chapter_start = entry['time']
+        elif not current:
+            chapter_start = entry['time']
+        current.append(entry['text'])
+
+    if current:
+        chapters.append({
+            'index': len(chapters),
+            'start': chapter_start,
+            'end': max(duration, timestamps[-1]['time']),
+            'text': ' '.join(current)
+        })
+
+    return chapters
+
+# YouTube caption language codes for the summary languages offered by the UI
+LANGUAGE_CODES = {
+    'english': ['en', 'en-US', 'en-GB'],
+    'spanish': ['es', 'es-419', 'es-ES'],
+    'french': ['fr', 'fr-FR', 'fr-CA'],
+    'german': ['de', 'de-DE'],
+    'japanese': ['ja'],
+    'chinese': ['zh-Hans', 'zh', 'zh-CN', 'zh-Hant', 'zh-TW'],
+    'hindi': ['hi'],
+    'portuguese': ['pt', 'pt-BR', 'pt-PT'],
+    'russian': ['ru'],
+    'arabic': ['ar'],
+}
+
+# Transcript listings are reused across language requests for the same video
+TRANSCRIPT_LIST_TTL_SECONDS = 600
+_TRANSCRIPT_LIST_LIMIT = 128
+_transcript_lists = {}
+# fetch_transcript runs in worker threads
+_transcript_lists_lock = threading.Lock()
+
+def _get_transcript_list(video_id: str):
+    """List a video's transcripts, reusing a recent listing when available."""
+    cached = _transcript_lists.get(video_id)
+    if cached and time.monotonic() - cached[0] < TRANSCRIPT_LIST_TTL_SECONDS:
+        logger.info('Reusing transcript list for video %s', video_id)
+        return cached[1]
+
+    logger.info('Calling YouTubeTranscriptApi.list...')
+    transcript_list = YouTubeTranscriptApi(http_client=_youtube_session).list(video_id)
+    with _transcript_lists_lock:
+        _transcript_lists[video_id] = (time.monotonic(), transcript_list)
+        if len(_transcript_lists) > _TRANSCRIPT_LIST_LIMIT:
+            del _transcript_lists[next(iter(_transcript_lists))]
+    return transcript_list
+
+def select_transcript(transcript_list, target_language: str = "English"):
+    """
+    Pick the transcript that avoids translation where possible:
+    1. A manually created track in the target language
+    2. An auto-generated track in the target language
+    3. The video's native track (auto-generated captions follow the spoken language)
+    4. Any manually created track
+    The summarizer translates from the track's language to the target language
+    in the same call, so captions are never machine-translated first.
+    """
+    target_codes = LANGUAGE_CODES.get((target_language or 'english').lower(), [])
+    available = list(transcript_list)
+    logger.info("Available transcripts: %s", available)
+
+    if target_codes:
+        for is_generated in (False, True):
+            for code in target_codes:
+                for transcript in available:
+                    if transcript.is_generated == is_generated and transcript.language_code == code:
+                        return transcript
+
+    for transcript in available:
+        if transcript.is_generated:
+            return transcript
+
+    return available[0] if available else None
+
+def fetch_transcript(video_id: str, target_language: str = "English") -> dict:
+    """
+    Fetch transcript for a YouTube video, preferring a track in target_language
+    and otherwise the video's native language (see select_transcript).
+    Returns dict with 'text' (full transcript), 'timestamps' (list of segments),
+    'duration' and 'language' (name of the transcript's language).
+    YouTube calls are bounded by the request deadline; raises DeadlineExceeded
+    once it has passed.
     Note: May fail in cloud environments due to YouTube blocking cloud provider IPs.
     """
-    logging.info(f'=== Starting transcript fetch for video ID: {video_id} ===')
+    logger.info('=== Starting transcript fetch for video ID: %s ===', video_id)
     try:
-        # Fetch transcript (tries to get English first, then any available)
-        logging.info('Calling YouTubeTranscriptApi.list...')
-        # Create instance and call list
-        yt_api = YouTubeTranscriptApi()
-        transcript_list = yt_api.list(video_id)
-        logging.info(f'Successfully retrieved transcript list for video {video_id}')
-        
-        # Try multiple approaches to get a transcript
-        transcript = None
-        last_error = None
-        
-        # 1. Try manually created English transcript
-        try:
-            transcript = transcript_list.find_manually_created_transcript(['en'])
-            logging.info(f"Found manually created English transcript for {video_id}")
-        except Exception as e:
-            logging.debug(f"No manually created transcript: {str(e)}")
-            last_error = e
-        
-        # 2. Try auto-generated English transcript
-        if not transcript:
-            try:
-                transcript = transcript_list.find_generated_transcript(['en'])
-                logging.info(f"Found auto-generated English transcript for {video_id}")
-            except Exception as e:
-                logging.debug(f"No auto-generated transcript: {str(e)}")
-                last_error = e
-        
-        # 3. Try any English transcript
-        if not transcript:
-            try:
-                transcript = transcript_list.find_transcript(['en'])
-                logging.info(f"Found English transcript for {video_id}")
-            except Exception as e:
-                logging.debug(f"No English transcript: {str(e)}")
-                last_error = e
-        
-        # 4. Try any available transcript and translate to English
-        if not transcript:
-            try:
-                # Get any available transcript
-                available_transcripts = list(transcript_list)
-                logging.info(f"Available transcripts: {[str(t) for t in available_transcripts]}")
-                if available_transcripts:
-                    transcript = available_transcripts[0].translate('en')
-                    logging.info(f"Translated transcript to English for {video_id}")
-            except Exception as e:
-                logging.debug(f"Could not translate transcript: {str(e)}")
-                last_error = e
+        transcript_list = _get_transcript_list(video_id)
+        logger.info('Successfully retrieved transcript list for video %s', video_id)
         
+        transcript = select_transcript(transcript_list, target_language)
         if not transcript:
-            logging.error(f"No transcript available for video {video_id}. Last error: {str(last_error)}")
+            logger.error("No transcript available for video %s", video_id)
             return None
+        logger.info("Selected %s transcript (%s) for %s", transcript.language, transcript.language_code, video_id)
         
-        logging.info(f"Fetching transcript data for {video_id}...")
+        check("extraction")
+        logger.info("Fetching transcript data for %s...", video_id)
         transcript_data = transcript.fetch()
-        logging.info(f"Successfully fetched {len(transcript_data)} transcript segments")
+        logger.info("Successfully fetched %s transcript segments", len(transcript_data))
         
         # Build full text from transcript segments
         # Note: transcript_data items are dataclass objects, use attributes not dict access
@@ -110,26 +194,32 @@ def fetch_transcript(video_id: str) -> dict:
         return {
             'text': full_text,
             'timestamps': timestamps,
-            'duration': duration
+            'duration': duration,
+            'language': transcript.language.split(' (')[0],
+            'languageCode': transcript.language_code
         }
     
+    except DeadlineExceeded:
+        raise
     except RequestBlocked as e:
-        logging.error(f"[TRANSCRIPT ERROR] YouTube blocked the request for video {video_id}")
-        logging.error("This typically happens when running in cloud environments (Azure, AWS, GCP)")
-        logging.error("YouTube blocks requests from cloud provider IP addresses")
+        logger.error("[TRANSCRIPT ERROR] YouTube blocked the request for video %s", video_id)
+        logger.error("This typically happens when running in cloud environments (Azure, AWS, GCP)")
+        logger.error("YouTube blocks requests from cloud provider IP addresses")
         return None
     except TranscriptsDisabled:
-        logging.error(f"[TRANSCRIPT ERROR] Transcripts are disabled for video {video_id}")
+        logger.error("[TRANSCRIPT ERROR] Transcripts are disabled for video %s", video_id)
         return None
     except NoTranscriptFound:
-        logging.error(f"[TRANSCRIPT ERROR] No transcript found for video {video_id}")
+        logger.error("[TRANSCRIPT ERROR] No transcript found for video %s", video_id)
         return None
     except AttributeError as e:
-        logging.error(f"[TRANSCRIPT ERROR] AttributeError for video {video_id}: {str(e)}", exc_info=True)
+        logger.error("[TRANSCRIPT ERROR] AttributeError for video %s: %s", video_id, e, exc_info=True)
         return None
     except Exception as e:
-        logging.error(f"[TRANSCRIPT ERROR] Unexpected error fetching transcript for video {video_id}: {str(e)}", exc_info=True)
-        logging.error(f"[TRANSCRIPT ERROR] Exception type: {type(e).__name__}")
+        # A YouTube call that timed out at the deadline is a deadline miss, not a missing transcript
+        check("extraction")
+        logger.error("[TRANSCRIPT ERROR] Unexpected error fetching transcript for video %s: %s", video_id, e, exc_info=True)
+        logger.error("[TRANSCRIPT ERROR] Exception type: %s", type(e).__name__)
         import traceback
-        logging.error(f"[TRANSCRIPT ERROR] Full traceback: {traceback.format_exc()}")
+        logger.error("[TRANSCRIPT ERROR] Full traceback: %s", traceback.format_exc())
         return None
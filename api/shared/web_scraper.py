@@ -1,19 +1,71 @@
 """
 Web article scraping utilities for extracting content from URLs.
 """
-import logging
+import hashlib
 import requests
 from bs4 import BeautifulSoup
+from shared.request_logging import get_logger
+from shared.deadline import time_left
+
+logger = get_logger(__name__)
+
+# Section boundaries for incremental re-summarization
+SECTION_MIN_CHARS = 1500
+SECTION_MAX_CHARS = 4000
+SECTION_BOUNDARY_MODULUS = 4
+
+def get_article_id(url: str) -> str:
+    """
+    Build a stable document id for an article URL.
+    Cosmos DB ids cannot contain '/', so the URL is hashed.
+    """
+    return 'article_' + hashlib.sha256(url.strip().encode('utf-8')).hexdigest()[:32]
+
+def content_hash(text: str) -> str:
+    """Short SHA-256 hash used to detect changed content."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]
+
+def split_sections(paragraphs: list) -> list:
+    """
+    Group paragraphs into sections with content-defined boundaries.
+    A section closes after a paragraph whose hash hits the boundary modulus
+    (once the section is at least SECTION_MIN_CHARS long) or when it reaches
+    SECTION_MAX_CHARS. Because boundaries depend on paragraph content rather
+    than position, inserting or editing a paragraph only changes the hash of
+    the section it lands in.
+    Returns list of dicts with 'hash' and 'text'.
+    """
+    sections = []
+    current = []
+    current_len = 0
+
+    for paragraph in paragraphs:
+        current.append(paragraph)
+        current_len += len(paragraph)
+        at_boundary = int(content_hash(paragraph), 16) % SECTION_BOUNDARY_MODULUS == 0
+        if current_len >= SECTION_MAX_CHARS or (current_len >= SECTION_MIN_CHARS and at_boundary):
+            text = '\n\n'.join(current)
+            sections.append({'hash': content_hash(text), 'text': text})
+            current = []
+            current_len = 0
+
+    if current:
+        text = '\n\n'.join(current)
+        sections.append({'hash': content_hash(text), 'text': text})
+
+    return sections
 
 def fetch_article_content(url: str) -> dict:
     """
     Fetch and extract content from a web article URL using BeautifulSoup.
-    Returns dict with 'text' (article content), 'title', and 'author'.
+    Returns dict with 'text' (article content), 'title', 'author' and
+    'sections' (content-hashed chunks used for incremental re-summarization).
     """
-    logging.info(f'=== Starting article fetch for URL: {url} ===')
+    logger.info('=== Starting article fetch for URL: %s ===', url)
     
     try:
-        response = requests.get(url, timeout=10, headers={
+        # Never wait past the request deadline
+        response = requests.get(url, timeout=time_left(10), headers={
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
         })
         response.raise_for_status()
@@ -74,21 +126,22 @@ def fetch_article_content(url: str) -> dict:
         text = '\n\n'.join(lines)
         
         if text and len(text) > 100:
-            logging.info(f"Successfully fetched article using BeautifulSoup: {title_text}")
+            logger.info("Successfully fetched article using BeautifulSoup: %s", title_text)
             return {
                 'text': text,
                 'title': title_text,
                 'author': 'Unknown',
                 'url': url,
+                'sections': split_sections(lines),
                 'source': 'beautifulsoup'
             }
         else:
-            logging.error(f"Extracted text too short: {len(text)} characters")
+            logger.error("Extracted text too short: %s characters", len(text))
             return None
             
     except requests.RequestException as e:
-        logging.error(f"Request error fetching article: {str(e)}")
+        logger.error("Request error fetching article: %s", e)
         return None
     except Exception as e:
-        logging.error(f"Error fetching article content: {str(e)}", exc_info=True)
+        logger.error("Error fetching article content: %s", e, exc_info=True)
         return None